@@ -0,0 +1,173 @@
+"""
+AI 压力测试 - 用多个线程驱动 AIService 请求本地桩服务（或指定的地址），统计吞吐量和尾延迟
+
+用法:
+    python -m benchmarks.ai_load --requests 200 --concurrency 16
+    python -m benchmarks.ai_load --rate-429 0.1 --rate-malformed 0.05 --latency exp:300
+    python -m benchmarks.ai_load --mode recursive --requests 20
+    python -m benchmarks.ai_load --mode stream
+    python -m benchmarks.ai_load --base-url http://127.0.0.1:8799/v1   # 使用已启动的桩服务
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import ai_stub
+from services.ai_service import AIService
+from services.settings_service import SettingsService
+from services.telemetry_service import AITelemetry
+
+TASK_NAMES = ["写季度报告", "学习线性代数", "打扫房间", "准备面试", "整理照片", "规划旅行"]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """精确分位数（线性插值）"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+def make_ai_service(base_url: str, work_dir: str, timeout: float) -> AIService:
+    """指向 base_url 的 AIService（设置和统计文件放在临时目录）"""
+    settings = SettingsService(os.path.join(work_dir, "settings.json"))
+    settings.settings["request_timeout"] = timeout
+    settings.set_api_config("custom", "sk-stub", base_url, "stub-model")
+    return AIService(settings, telemetry=AITelemetry(os.path.join(work_dir, "telemetry.json")))
+
+
+def _one_request(ai_service: AIService, mode: str, index: int) -> dict:
+    task = f"{TASK_NAMES[index % len(TASK_NAMES)]} #{index}"
+    start = time.perf_counter()
+    first_token_ms = None
+    if mode == "stream":
+        try:
+            stream = ai_service._create(
+                messages=[
+                    {"role": "system", "content": ai_service.system_prompt},
+                    {"role": "user", "content": f"请帮我分解这个任务：{task}"}
+                ],
+                stream=True
+            )
+            parts = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                    parts.append(delta)
+            result = {"success": bool(parts)}
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+    elif mode == "recursive":
+        result = ai_service.break_down_recursive(task, split_minutes=30, allow_offline=False)
+    else:
+        result = ai_service.break_down_task(task, allow_offline=False)
+    return {
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "first_token_ms": first_token_ms,
+        "success": result["success"],
+        "error": None if result["success"] else str(result.get("error"))[:80],
+    }
+
+
+def run_load(ai_service: AIService, requests: int, concurrency: int, mode: str = "single") -> dict:
+    results = []
+    lock = threading.Lock()
+
+    def worker(index):
+        outcome = _one_request(ai_service, mode, index)
+        with lock:
+            results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(r["latency_ms"] for r in results)
+    ok = [r for r in results if r["success"]]
+    errors = {}
+    for r in results:
+        if not r["success"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    report = {
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2),
+        "success_rate": round(len(ok) / requests, 4) if requests else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.5), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "max": round(latencies[-1], 1) if latencies else 0.0,
+        },
+        "errors": errors,
+        "ai_metrics": ai_service.get_metrics(),
+    }
+    first_tokens = sorted(r["first_token_ms"] for r in results if r["first_token_ms"] is not None)
+    if first_tokens:
+        report["first_token_ms"] = {
+            "p50": round(percentile(first_tokens, 0.5), 1),
+            "p95": round(percentile(first_tokens, 0.95), 1),
+        }
+    if ai_service.telemetry is not None:
+        report["telemetry"] = ai_service.telemetry.summary(days=1)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AIService 压力测试")
+    parser.add_argument("--requests", type=int, default=100, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数")
+    parser.add_argument("--mode", choices=["single", "recursive", "stream"], default="single")
+    parser.add_argument("--timeout", type=float, default=5.0, help="客户端请求超时（秒）")
+    parser.add_argument("--base-url", help="使用已启动的服务，不启动内置桩服务")
+    parser.add_argument("-o", "--output", help="把报告写入JSON文件")
+    ai_stub.add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = ai_stub.start_in_background(ai_stub.config_from_args(args))
+    work_dir = tempfile.mkdtemp(prefix="doitnow_ai_load_")
+    try:
+        ai_service = make_ai_service(base_url, work_dir, args.timeout)
+        report = run_load(ai_service, args.requests, args.concurrency, args.mode)
+        if server is not None:
+            report["stub"] = {"latency": args.latency, "outcomes": dict(server.RequestHandlerClass.config.stats)}
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    latency = report["latency_ms"]
+    print(f"{report['requests']} 个请求, 并发 {report['concurrency']}, 用时 {report['wall_s']}s")
+    print(f"吞吐量 {report['throughput_rps']} 个/秒, 成功率 {report['success_rate']:.1%}")
+    print(f"延迟 p50 {latency['p50']}ms / p95 {latency['p95']}ms / p99 {latency['p99']}ms / 最大 {latency['max']}ms")
+    if "first_token_ms" in report:
+        print(f"首字 p50 {report['first_token_ms']['p50']}ms / p95 {report['first_token_ms']['p95']}ms")
+    for error, n in report["errors"].items():
+        print(f"  失败 {n} 次: {error}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
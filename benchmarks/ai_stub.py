@@ -0,0 +1,296 @@
+"""
+本地 AI 服务桩 - 兼容 OpenAI /v1/chat/completions（含流式），用于离线测试延迟、并发和故障处理
+
+接口:
+    POST /v1/chat/completions      返回预置的分解结果
+    GET  /v1/models                模型列表
+    GET  /stats                    各种结果的计数
+
+用法:
+    python -m benchmarks.ai_stub --port 8799 --latency lognormal:400,0.5 --rate-429 0.05
+    然后在设置里选 "自定义"，接口地址填 http://127.0.0.1:8799/v1，API Key 随便填
+
+延迟分布:
+    fixed:200              固定 200ms
+    uniform:100,400        100~400ms 均匀分布
+    lognormal:300,0.5      中位数 300ms，sigma 0.5
+    exp:300                平均 300ms 的指数分布
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 关键词 -> 预置的分解结果（没有匹配时用 GENERIC_BREAKDOWN）
+CANNED_BREAKDOWNS = {
+    "报告": [("打开文档，写下标题", 3), ("列出三个要点", 10), ("收集需要的数据", 25),
+           ("写第一部分", 30), ("写剩下的部分", 60), ("检查并发送", 10)],
+    "学习": [("准备好书和笔记本", 3), ("看目录确定范围", 5), ("读第一节", 25),
+           ("做几道练习", 20), ("整理笔记", 15)],
+    "打扫": [("打开窗户通风", 2), ("把东西放回原处", 15), ("擦桌面", 10),
+           ("扫地拖地", 20), ("倒垃圾", 5)],
+}
+GENERIC_BREAKDOWN = [("花两分钟想清楚要做什么", 2), ("准备需要的东西", 5), ("完成第一小步", 15),
+                     ("继续推进主要部分", 50), ("检查结果", 10), ("收尾整理", 5)]
+# 递归分解时子步骤的结果（都很短，保证递归会结束）
+CHILD_BREAKDOWN = [("先做最简单的部分", 10), ("完成主要内容", 20), ("检查一遍", 5)]
+
+
+def parse_latency(spec: str):
+    """把延迟分布描述解析成返回秒数的函数"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values[0], values[1] if len(values) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+class StubConfig:
+    """桩服务的行为（各种错误的概率在 0~1 之间，依次判定）"""
+
+    def __init__(self, latency: str = "fixed:50", rate_429: float = 0.0,
+                 rate_500: float = 0.0, rate_timeout: float = 0.0,
+                 rate_malformed: float = 0.0, timeout_seconds: float = 30.0,
+                 retry_after: float = 0.1, stream_chunk_delay: float = 0.01,
+                 canned: dict = None, seed: int = None):
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rate_timeout = rate_timeout
+        self.rate_malformed = rate_malformed
+        self.timeout_seconds = timeout_seconds
+        self.retry_after = retry_after
+        self.stream_chunk_delay = stream_chunk_delay
+        self.canned = canned if canned is not None else CANNED_BREAKDOWNS
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+
+    def count(self, outcome: str):
+        with self.stats_lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def draw(self):
+        """返回 (延迟秒数, 结果)，结果为 ok/429/500/timeout/malformed"""
+        with self.rng_lock:
+            delay = self.latency(self.rng)
+            roll = self.rng.random()
+        for outcome, rate in (("429", self.rate_429), ("500", self.rate_500),
+                              ("timeout", self.rate_timeout), ("malformed", self.rate_malformed)):
+            if roll < rate:
+                return delay, outcome
+            roll -= rate
+        return delay, "ok"
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+
+def build_reply(config: StubConfig, messages: list) -> str:
+    """根据请求内容生成回复文本"""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if "修复" in system:
+        # 修复重问：返回合法的JSON
+        steps = GENERIC_BREAKDOWN
+    elif not system:
+        # 测试连接
+        return "OK"
+    elif "这是任务「" in user:
+        steps = CHILD_BREAKDOWN
+    else:
+        steps = next((s for keyword, s in config.canned.items() if keyword in user), None)
+        if steps is None:
+            # 同一个任务每次返回相同的结果
+            digest = hashlib.md5(user.encode("utf-8")).digest()
+            steps = GENERIC_BREAKDOWN[: 4 + digest[0] % 3]
+    return json.dumps({"subtasks": [{"name": name, "minutes": minutes} for name, minutes in steps]},
+                      ensure_ascii=False)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # 保持连接，和真实服务商一致
+    config: StubConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: dict = None):
+        self._send_json(status, {"error": {"message": message, "type": error_type}}, headers)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.config.stats_lock:
+                self._send_json(200, dict(self.config.stats))
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+        else:
+            self._send_error(404, "not found", "invalid_request_error")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_error(404, "not found", "invalid_request_error")
+            return
+        try:
+            request = json.loads(raw.decode("utf-8"))
+            messages = request["messages"]
+        except (ValueError, KeyError):
+            self._send_error(400, "invalid request body", "invalid_request_error")
+            return
+
+        config = self.config
+        delay, outcome = config.draw()
+        config.count(outcome)
+        if outcome == "timeout":
+            # 不回复，直到客户端超时断开
+            time.sleep(config.timeout_seconds)
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        if outcome == "429":
+            self._send_error(429, "rate limit exceeded (stub)", "rate_limit_error",
+                             {"Retry-After": str(config.retry_after)})
+            return
+        if outcome == "500":
+            self._send_error(500, "internal error (stub)", "server_error")
+            return
+
+        content = build_reply(config, messages)
+        if outcome == "malformed":
+            # 截断的JSON，触发解析失败和修复重问
+            content = content[: max(1, len(content) // 2)]
+
+        model = request.get("model") or "stub-model"
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _estimate_tokens(content),
+            "total_tokens": prompt_tokens + _estimate_tokens(content),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        if request.get("stream"):
+            self._send_stream(completion_id, model, content)
+            return
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_stream(self, completion_id: str, model: str, content: str):
+        """Server-Sent Events，每块几个字"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = ("data: " + (payload if isinstance(payload, str)
+                                else json.dumps(payload, ensure_ascii=False)) + "\n\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        base = {"id": completion_id, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        send_event(dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                        "finish_reason": None}]))
+        for i in range(0, len(content), 8):
+            time.sleep(self.config.stream_chunk_delay)
+            send_event(dict(base, choices=[{"index": 0, "delta": {"content": content[i:i + 8]},
+                                            "finish_reason": None}]))
+        send_event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def create_stub_server(config: StubConfig = None, host: str = "127.0.0.1",
+                       port: int = 8799) -> ThreadingHTTPServer:
+    """创建桩服务（port 为 0 时自动选择端口，调用 serve_forever() 启动）"""
+    handler = type("StubHandler", (_StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(config: StubConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """在后台线程启动，返回 (server, base_url)"""
+    server = create_stub_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="lognormal:300,0.5", help="延迟分布，见模块说明")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="不回复（超时）的概率")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="返回截断JSON的概率")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0, help="超时故障挂起的秒数")
+    parser.add_argument("--canned", help="预置分解结果的JSON文件：{关键词: [[步骤, 分钟], ...]}")
+    parser.add_argument("--seed", type=int, help="随机种子")
+
+
+def config_from_args(args) -> StubConfig:
+    canned = None
+    if args.canned:
+        with open(args.canned, "r", encoding="utf-8") as f:
+            canned = json.load(f)
+    return StubConfig(
+        latency=args.latency, rate_429=args.rate_429, rate_500=args.rate_500,
+        rate_timeout=args.rate_timeout, rate_malformed=args.rate_malformed,
+        timeout_seconds=args.timeout_seconds, canned=canned, seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_stub_server(config_from_args(args), args.host, args.port)
+    print(f"AI 桩服务已启动: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,54 @@
+"""
+对比两次基准测试结果（按中位数），变慢超过阈值时返回非零退出码
+
+用法:
+    python -m benchmarks.compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+    python -m benchmarks.compare old.json new.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(old: dict, new: dict, threshold: float = 0.2) -> list:
+    """返回 [(名称, 旧中位数, 新中位数, 变化比例, 是否变慢)]，只比较两边都有的项"""
+    rows = []
+    for name, new_result in new["results"].items():
+        old_result = old["results"].get(name)
+        if old_result is None:
+            continue
+        before, after = old_result["median_ms"], new_result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2, help="变慢超过该比例视为退化")
+    args = parser.parse_args(argv)
+
+    old, new = load(args.old), load(args.new)
+    rows = compare(old, new, args.threshold)
+    print(f"{old['commit']} -> {new['commit']}")
+    for name, before, after, change, regressed in rows:
+        mark = "⚠️ " if regressed else "  "
+        print(f"{mark}{name:<32} {before:>10.2f} -> {after:>10.2f} ms  {change:+.0%}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} 项变慢超过 {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+基准测试数据 - 生成固定随机种子的任务数据（中文任务名，带子任务和部分嵌套步骤）
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from services import migrations, task_tree
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+_VERBS = ["整理", "撰写", "准备", "复习", "检查", "修改", "提交", "学习", "设计", "测试",
+          "清理", "安排", "阅读", "汇总", "联系", "更新", "翻译", "练习", "规划", "部署"]
+_OBJECTS = ["周报", "毕业论文", "季度预算", "英语单词", "项目文档", "会议纪要", "客户方案",
+            "房间", "读书笔记", "简历", "数据报表", "旅行计划", "代码评审", "产品原型",
+            "年度总结", "课程作业", "网站首页", "演讲稿", "报销单据", "健身计划"]
+_STEPS = ["收集资料", "列出大纲", "完成初稿", "检查细节", "确认格式", "发送给同事",
+          "整理桌面", "打开文档", "写第一段", "核对数字", "补充图表", "最后通读"]
+
+
+def parse_size(size) -> int:
+    """"10k" / "100k" / 1000 -> 任务数量"""
+    if isinstance(size, int):
+        return size
+    return SIZES.get(size) or int(size)
+
+
+def _make_step(rng: random.Random, created_at: str, depth: int) -> dict:
+    node = {
+        "name": rng.choice(_STEPS),
+        "minutes": rng.choice([5, 10, 15, 20, 25, 30]),
+        "done": rng.random() < 0.4,
+        "created_at": created_at,
+    }
+    if depth == 0 and rng.random() < 0.1:
+        node["children"] = [_make_step(rng, created_at, depth + 1) for _ in range(rng.randint(2, 4))]
+        node["leaf_total"], node["leaf_done"] = task_tree.count_leaves(node["children"])
+        node["done"] = node["leaf_done"] == node["leaf_total"]
+    return node
+
+
+def make_data(n_tasks, seed: int = 42, first_index: int = 0,
+              min_subtasks: int = 3, max_subtasks: int = 8) -> dict:
+    """生成与 tasks.json 相同结构的数据
+
+    任务ID由序号决定：first_index 相同的两份数据ID相同，用来构造部分重叠的导入数据
+    """
+    n_tasks = parse_size(n_tasks)
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    tasks = {}
+    for i in range(first_index, first_index + n_tasks):
+        created = start + timedelta(seconds=i * 37)
+        created_at = created.isoformat()
+        task_id = created.strftime("%Y%m%d%H%M%S") + f"{i:06d}"
+        subtasks = [_make_step(rng, created_at, 0)
+                    for _ in range(rng.randint(min_subtasks, max_subtasks))]
+        leaf_total, leaf_done = task_tree.count_leaves(subtasks)
+        tasks[task_id] = {
+            "name": f"{rng.choice(_VERBS)}{rng.choice(_OBJECTS)}",
+            "created_at": created_at,
+            "subtasks": subtasks,
+            "completed": False,
+            "leaf_total": leaf_total,
+            "leaf_done": leaf_done,
+            "schema": migrations.SCHEMA_VERSION,
+        }
+    return {"tasks": tasks, "schema_version": migrations.SCHEMA_VERSION}
+
+
+def write_data_file(path: str, n_tasks, seed: int = 42) -> dict:
+    """生成数据并写入文件（DataService 可以直接加载）"""
+    data = make_data(n_tasks, seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
+
+
+def make_export_string(n_tasks, seed: int = 7, first_index: int = 0) -> str:
+    """生成 get_export_string 格式的导入数据"""
+    return json.dumps({
+        "app": "TaskBreaker",
+        "version": "1.0",
+        "schema_version": migrations.SCHEMA_VERSION,
+        "exported_at": datetime(2025, 6, 1).isoformat(),
+        "data": make_data(n_tasks, seed, first_index),
+    }, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    for name in SIZES:
+        data = make_data(name)
+        leaves = sum(t["leaf_total"] for t in data["tasks"].values())
+        size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        print(f"{name}: {len(data['tasks'])} 个任务, {leaves} 个步骤, {size / 1e6:.1f} MB")
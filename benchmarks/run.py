@@ -0,0 +1,318 @@
+"""
+基准测试 - 存储、导入导出、加密和界面行构建的耗时
+
+用法:
+    python -m benchmarks.run                       # 1k 和 10k
+    python -m benchmarks.run --sizes 1k,10k,100k
+    python -m benchmarks.run --only data.save,ui.task_rows
+
+结果写入 benchmarks/results/<提交>.json，用 benchmarks.compare 对比两次结果。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import datasets
+from services.data_service import DataService
+from services.settings_service import Encryptor
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# 名称 -> (函数, 是否和数据量有关)
+BENCHMARKS = {}
+
+
+def benchmark(name: str, sized: bool = True):
+    """注册基准测试：函数接收上下文，返回 measure() 的结果"""
+    def register(func):
+        BENCHMARKS[name] = (func, sized)
+        return func
+    return register
+
+
+def measure(func, setup=None, repeat: int = 5, budget: float = 10.0, ops: int = 1) -> dict:
+    """重复运行 func（setup 不计时），超过 budget 秒后不再重复（至少运行一次）"""
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeat:
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        func(arg) if setup else func()
+        times.append((time.perf_counter() - t0) * 1000)
+        if time.perf_counter() - started > budget:
+            break
+    median = statistics.median(times)
+    return {
+        "runs": len(times),
+        "ops": ops,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(median, 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "per_op_ms": round(median / ops, 4),
+    }
+
+
+class Context:
+    """一种数据量的测试环境：生成一次数据文件，每次测试前复制一份"""
+
+    def __init__(self, n_tasks: int, work_dir: str, repeat: int, budget: float):
+        self.n_tasks = n_tasks
+        self.repeat = repeat
+        self.budget = budget
+        self.work_dir = work_dir
+        self.template_file = os.path.join(work_dir, f"template_{n_tasks}.json")
+        self.data = datasets.write_data_file(self.template_file, n_tasks)
+        self.task_ids = list(self.data["tasks"])
+
+    def fresh_service(self) -> DataService:
+        data_file = os.path.join(self.work_dir, "tasks.json")
+        shutil.copyfile(self.template_file, data_file)
+        return DataService(data_file)
+
+    def measure(self, func, setup=None, ops: int = 1) -> dict:
+        return measure(func, setup, self.repeat, self.budget, ops)
+
+
+# ============ DataService ============
+
+@benchmark("data.load")
+def bench_load(ctx: Context) -> dict:
+    data_file = os.path.join(ctx.work_dir, "tasks.json")
+    shutil.copyfile(ctx.template_file, data_file)
+    return ctx.measure(lambda: DataService(data_file))
+
+
+@benchmark("data.load_snapshot")
+def bench_load_snapshot(ctx: Context) -> dict:
+    data_file = os.path.join(ctx.work_dir, "tasks.json")
+    shutil.copyfile(ctx.template_file, data_file)
+    DataService(data_file, binary_snapshot=True)   # 写入和复制的 JSON 对应的快照
+    return ctx.measure(lambda: DataService(data_file, binary_snapshot=True))
+
+
+def _cold_start(data_file: str, binary_snapshot: bool):
+    """启动到显示任务列表并打开第一个任务"""
+    service = DataService(data_file, binary_snapshot=binary_snapshot)
+    summaries = service.get_task_summaries()
+    service.get_task(next(iter(summaries)))
+
+
+@benchmark("data.cold_start")
+def bench_cold_start(ctx: Context) -> dict:
+    data_file = os.path.join(ctx.work_dir, "tasks.json")
+    shutil.copyfile(ctx.template_file, data_file)
+    return ctx.measure(lambda: _cold_start(data_file, False))
+
+
+@benchmark("data.cold_start_snapshot")
+def bench_cold_start_snapshot(ctx: Context) -> dict:
+    data_file = os.path.join(ctx.work_dir, "tasks.json")
+    shutil.copyfile(ctx.template_file, data_file)
+    DataService(data_file, binary_snapshot=True)
+    return ctx.measure(lambda: _cold_start(data_file, True))
+
+
+@benchmark("data.save_with_snapshot")
+def bench_save_with_snapshot(ctx: Context) -> dict:
+    data_file = os.path.join(ctx.work_dir, "tasks.json")
+    shutil.copyfile(ctx.template_file, data_file)
+    service = DataService(data_file, binary_snapshot=True)
+    return ctx.measure(service.save)
+
+
+@benchmark("data.save")
+def bench_save(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    return ctx.measure(service.save)
+
+
+@benchmark("data.add_task")
+def bench_add_task(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    return ctx.measure(lambda: service.add_task("新的任务"))
+
+
+@benchmark("data.add_subtasks_batch")
+def bench_add_subtasks(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    task_id = ctx.task_ids[len(ctx.task_ids) // 2]
+    steps = [{"name": f"步骤{i}", "minutes": 10} for i in range(5)]
+    return ctx.measure(lambda: service.add_subtasks_batch(task_id, steps))
+
+
+@benchmark("data.toggle_subtask")
+def bench_toggle(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    task_id = ctx.task_ids[-1]
+    return ctx.measure(lambda: service.toggle_subtask(task_id, 0))
+
+
+@benchmark("data.batch_toggle_100")
+def bench_batch_toggle(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    task_ids = ctx.task_ids[:100]
+
+    def run():
+        with service.batch():
+            for task_id in task_ids:
+                service.toggle_subtask(task_id, 0)
+    return ctx.measure(run, ops=len(task_ids))
+
+
+@benchmark("data.delete_task")
+def bench_delete(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    task_ids = iter(ctx.task_ids)
+    return ctx.measure(lambda: service.delete_task(next(task_ids)))
+
+
+@benchmark("data.get_all_tasks")
+def bench_get_all(ctx: Context) -> dict:
+    def setup():
+        service = ctx.fresh_service()
+        service.migrate_pending(len(ctx.task_ids))
+        return service
+    return ctx.measure(lambda service: service.get_all_tasks(), setup)
+
+
+@benchmark("data.export_string")
+def bench_export(ctx: Context) -> dict:
+    service = ctx.fresh_service()
+    return ctx.measure(service.get_export_string)
+
+
+@benchmark("data.import_merge")
+def bench_import(ctx: Context) -> dict:
+    # 一半任务已存在，一半是新任务
+    half = ctx.n_tasks // 2
+    export_text = datasets.make_export_string(ctx.n_tasks, first_index=half)
+    return ctx.measure(
+        lambda service: service.import_from_string(export_text), ctx.fresh_service
+    )
+
+
+# ============ 加密 ============
+
+@benchmark("encryptor.api_key", sized=False)
+def bench_encrypt_key(ctx: Context) -> dict:
+    enc = Encryptor("benchmark")
+    key = "sk-" + "0123456789abcdef" * 3
+
+    def run():
+        for _ in range(1000):
+            enc.decrypt(enc.encrypt(key))
+    return ctx.measure(run, ops=1000)
+
+
+@benchmark("encryptor.1mb", sized=False)
+def bench_encrypt_1mb(ctx: Context) -> dict:
+    enc = Encryptor("benchmark")
+    text = "番茄工作法" * (1024 * 1024 // 15)
+
+    def run():
+        assert enc.decrypt(enc.encrypt(text)) == text
+    return ctx.measure(run)
+
+
+# ============ 界面 ============
+
+@benchmark("ui.task_rows")
+def bench_task_rows(ctx: Context) -> dict:
+    from ui.components import task_row
+
+    items = list(ctx.data["tasks"].items())
+    selected = ctx.task_ids[0]
+
+    def run():
+        return [task_row(task_id, task, task_id == selected, print, print)
+                for task_id, task in items]
+    return ctx.measure(run, ops=len(items))
+
+
+@benchmark("ui.subtask_rows", sized=False)
+def bench_subtask_rows(ctx: Context) -> dict:
+    from services.task_tree import iter_nodes
+    from ui.components import subtask_row
+
+    nodes = []
+    for task in list(ctx.data["tasks"].values())[:200]:
+        nodes.extend(iter_nodes(task["subtasks"]))
+
+    def run():
+        return [subtask_row(path, node, print, print) for path, node in nodes]
+    return ctx.measure(run, ops=len(nodes))
+
+
+# ============ 运行 ============
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: list, only=None, repeat: int = 5, budget: float = 10.0) -> dict:
+    names = [name for name in BENCHMARKS if not only or name in only]
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="doitnow_bench_")
+    try:
+        for size in sizes:
+            ctx = Context(datasets.parse_size(size), work_dir, repeat, budget)
+            for name in names:
+                func, sized = BENCHMARKS[name]
+                if not sized and size != sizes[0]:
+                    continue
+                key = f"{name}[{size}]" if sized else name
+                result = func(ctx)
+                results[key] = result
+                print(f"{key:<32} {result['median_ms']:>10.2f} ms"
+                      f"  ({result['per_op_ms']} ms/次, {result['runs']} 轮)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="运行基准测试")
+    parser.add_argument("--sizes", default="1k,10k", help="数据量，逗号分隔（1k,10k,100k）")
+    parser.add_argument("--only", help="只运行这些测试，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="每项最多重复次数")
+    parser.add_argument("--budget", type=float, default=10.0, help="每项最多运行秒数")
+    parser.add_argument("-o", "--output", help="结果文件，默认 benchmarks/results/<提交>.json")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(",")
+    only = set(args.only.split(",")) if args.only else None
+    commit = current_commit()
+    results = run(sizes, only, args.repeat, args.budget)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+任务分解器 - 命令行入口（无界面，批量操作）
+
+示例:
+    python cli.py list
+    python cli.py add tasks.txt              # 每行一个任务，或 JSON 任务列表
+    python cli.py done 20250101120000000000 0 1 2.0   # 2.0 表示第3步的第1个子步骤
+    python cli.py done --file done.txt       # 每行 "任务ID 子任务序号或路径"
+    python cli.py breakdown --empty --workers 8
+    python cli.py export -o backup.json
+    python cli.py import backup.json
+    python cli.py stats --weekly
+    python cli.py serve --port 8765
+"""
+
+import argparse
+import json
+import sys
+from contextlib import redirect_stdout
+
+from services.data_service import DataService
+from services.settings_service import SettingsService
+from services.ai_service import AIService
+from services.batch_service import BatchService
+from services.telemetry_service import AITelemetry
+from services.task_tree import get_progress
+from services.productivity import summarize
+
+
+def _read_text(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _print_json(payload):
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+
+
+def _make_ai_service() -> AIService:
+    """只有需要AI的命令才加载设置；加载时的提示输出到 stderr，不混进 JSON 输出"""
+    with redirect_stdout(sys.stderr):
+        return AIService(SettingsService(), telemetry=AITelemetry())
+
+
+def cmd_list(batch: BatchService, args) -> int:
+    tasks = batch.data_service.get_all_tasks()
+    if args.json:
+        _print_json(tasks)
+        return 0
+    for task_id, task in tasks.items():
+        done, total = get_progress(task)
+        print(f"{task_id}  {task['name']} ({done}/{total})")
+    return 0
+
+
+def cmd_add(batch: BatchService, args) -> int:
+    text = _read_text(args.file)
+    try:
+        items = json.loads(text)
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        # 不是 JSON 列表（包括 "2024" 这种恰好是合法 JSON 的单行）时按每行一个任务处理
+        items = [line.strip() for line in text.splitlines() if line.strip()]
+    result = batch.create_tasks(items)
+    _print_json(result)
+    return 0 if result["success"] else 1
+
+
+def cmd_done(batch: BatchService, args) -> int:
+    if args.file:
+        items = []
+        for line in _read_text(args.file).splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                items.append({"task_id": parts[0], "index": parts[1]})
+    else:
+        items = [{"task_id": args.task_id, "index": i} for i in args.indexes]
+    for item in items:
+        item["done"] = not args.undo
+    result = batch.set_done(items)
+    _print_json(result)
+    return 0 if result["success"] else 1
+
+
+def cmd_breakdown(batch: BatchService, args) -> int:
+    batch.ai_service = _make_ai_service()
+    task_ids = None if args.empty else args.task_ids
+    result = batch.break_down(task_ids, args.workers)
+    _print_json(result)
+    return 0 if result["success"] else 1
+
+
+def cmd_export(batch: BatchService, args) -> int:
+    export_text = batch.data_service.get_export_string()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(export_text)
+    else:
+        print(export_text)
+    return 0
+
+
+def cmd_import(batch: BatchService, args) -> int:
+    result = batch.data_service.import_from_string(_read_text(args.file))
+    _print_json(result)
+    return 0 if result["success"] else 1
+
+
+def cmd_stats(batch: BatchService, args) -> int:
+    rows = summarize(batch.data_service.get_stats(), "weekly" if args.weekly else "daily")
+    if args.json:
+        _print_json(rows)
+        return 0
+    for row in rows[-args.last:]:
+        rate = row["completion_rate"]
+        accuracy = row["estimate_accuracy"]
+        print(f"{row['period']}  计划 {row['planned_minutes']:.0f}分  完成 {row['done_minutes']:.0f}分"
+              f"  完成率 {'-' if rate is None else f'{rate:.0%}'}"
+              f"  预估准确度 {'-' if accuracy is None else f'{accuracy:.0%}'}")
+    return 0
+
+
+def cmd_serve(batch: BatchService, args) -> int:
+    from services.api_server import create_server
+
+    batch.ai_service = _make_ai_service()   # POST /tasks/breakdown
+    server = create_server(batch, args.host, args.port)
+    print(f"本地 API 已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="任务分解器命令行工具")
+    parser.add_argument("--data", default="data/tasks.json", help="数据文件路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="列出所有任务")
+    p.add_argument("--json", action="store_true", help="输出完整JSON")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("add", help="批量添加任务")
+    p.add_argument("file", help="任务文件（每行一个任务或JSON列表），- 表示标准输入")
+    p.set_defaults(func=cmd_add)
+
+    p = sub.add_parser("done", help="批量标记子任务完成")
+    p.add_argument("task_id", nargs="?")
+    p.add_argument("indexes", nargs="*", help="子任务序号，子步骤用路径如 2.0")
+    p.add_argument("--file", help="每行 \"任务ID 子任务序号或路径\"")
+    p.add_argument("--undo", action="store_true", help="标记为未完成")
+    p.set_defaults(func=cmd_done)
+
+    p = sub.add_parser("breakdown", help="批量AI分解")
+    p.add_argument("task_ids", nargs="*")
+    p.add_argument("--empty", action="store_true", help="分解所有没有子任务的任务")
+    p.add_argument("--workers", type=int, default=4, help="并发请求数")
+    p.set_defaults(func=cmd_breakdown)
+
+    p = sub.add_parser("export", help="导出数据")
+    p.add_argument("-o", "--output", help="输出文件，默认打印到标准输出")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="导入数据（合并，不覆盖已有任务）")
+    p.add_argument("file", help="导出的数据文件，- 表示标准输入")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("stats", help="效率统计（按天或按周）")
+    p.add_argument("--weekly", action="store_true", help="按周汇总")
+    p.add_argument("--last", type=int, default=14, help="显示最近几期")
+    p.add_argument("--json", action="store_true", help="输出JSON")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("serve", help="启动本地 HTTP API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    with redirect_stdout(sys.stderr):
+        data_service = DataService(args.data)
+    return args.func(BatchService(data_service), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
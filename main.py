@@ -2,11 +2,25 @@
 任务分解器 - 主程序（颜色兼容版）
 """
 
+import os
+import sys
+import threading
 import flet as ft
 from services.data_service import DataService
 from services.settings_service import SettingsService
 from services.ai_service import AIService
+from services.store_registry import StoreRegistry
+from services.prefetch_service import PrefetchService
+from services.offline_breakdown import OfflineBreakdownEngine
+from services.outbox_service import OutboxService
+from services.telemetry_service import AITelemetry
+from services.schedule_service import ScheduleService
+from services.task_tree import get_progress, iter_nodes
 from ui.settings_page import create_settings_view
+from ui.stats_page import create_stats_view
+from ui.plan_page import create_plan_view
+from ui.update_scheduler import UpdateScheduler
+from ui.components import task_row, subtask_row
 
 # 兼容新旧版本的颜色
 try:
@@ -14,6 +28,9 @@ try:
 except AttributeError:
     colors = ft.colors
 
+# 网页服务模式下由 --web 启用：按用户分片、多会话共享数据
+store_registry = None
+
 def main(page: ft.Page):
     # ============ 页面设置 ============
     page.title = "🎯 任务分解器"
@@ -22,12 +39,31 @@ def main(page: ft.Page):
     page.window_width = 450
     page.window_height = 700
     
+    # 合并刷新：每个操作只调用一次 page.update()
+    # 设置环境变量 DOITNOW_UI_STATS=1 可在控制台查看每个操作的刷新次数和字节数
+    ui_stats = os.environ.get("DOITNOW_UI_STATS") == "1"
+    scheduler = UpdateScheduler(page, measure_bytes=ui_stats, log_actions=ui_stats)
+    
     # ============ 初始化服务 ============
-    settings_service = SettingsService()
-    data_service = DataService()
-    ai_service = AIService(settings_service)
+    if store_registry:
+        # 通过 ?user=xxx 区分用户（或工作区）；page.query 在路由变化前是空的，直接解析初始路由
+        # 设置也按用户保存，访问者看不到也改不了其他用户（包括服务主人）的 API Key
+        user_id = StoreRegistry.user_id_from_route(page.route)
+        data_service = store_registry.acquire(user_id)
+        ai_service = store_registry.get_ai_service(user_id)   # 设置和调用统计也按用户分开
+        settings_service = ai_service.settings_service
+        outbox = store_registry.get_outbox(user_id)            # 同一分片的会话共用一个离线队列
+    else:
+        settings_service = SettingsService()
+        data_service = DataService(binary_snapshot=settings_service.settings.get("binary_snapshot", False))
+        ai_service = AIService(settings_service, OfflineBreakdownEngine(data_service), AITelemetry())
+        outbox = OutboxService(ai_service, data_service)
+        outbox.start()
+    prefetch_service = PrefetchService(ai_service)
+    schedule_service = ScheduleService(data_service, settings_service)   # 数据变化时增量重排
     
     current_task_id = None
+    seen_generation = data_service.generation   # 最近一次刷新时的数据版本
     main_content = ft.Column(expand=True)
     
     # ============ UI 组件 ============
@@ -60,93 +96,42 @@ def main(page: ft.Page):
     def show_message(message: str, color=colors.GREEN):
         page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor=color)
         page.snack_bar.open = True
-        page.update()
+        scheduler.request_update()
     
-    def refresh_task_list():
+    def rebuild_task_list():
+        nonlocal seen_generation
+        seen_generation = data_service.generation
         task_list.controls.clear()
-        tasks = data_service.get_all_tasks()
+        tasks = data_service.get_task_summaries()   # 从二进制快照启动时不解码任务
         
         for task_id, task in tasks.items():
-            total = len(task["subtasks"])
-            done = sum(1 for s in task["subtasks"] if s["done"])
-            progress = f"({done}/{total})" if total > 0 else ""
-            
-            is_selected = task_id == current_task_id
-            is_completed = done == total and total > 0
-            
             task_list.controls.append(
-                ft.Container(
-                    content=ft.Row([
-                        ft.Icon(
-                            ft.Icons.CHECK_CIRCLE if is_completed 
-                            else ft.Icons.RADIO_BUTTON_UNCHECKED,
-                            color=colors.GREEN if is_completed else colors.GREY,
-                            size=20
-                        ),
-                        ft.Text(
-                            f"{task['name']} {progress}",
-                            expand=True,
-                            weight=ft.FontWeight.BOLD if is_selected else None,
-                            size=14
-                        ),
-                        ft.IconButton(
-                            icon=ft.Icons.DELETE_OUTLINE,
-                            icon_color=colors.RED_400,
-                            icon_size=18,
-                            on_click=lambda e, tid=task_id: delete_task(tid)
-                        )
-                    ]),
-                    padding=10,
-                    border_radius=8,
-                    bgcolor=colors.BLUE_100 if is_selected else colors.GREY_100,
-                    on_click=lambda e, tid=task_id: select_task(tid)
-                )
+                task_row(task_id, task, task_id == current_task_id, select_task, delete_task)
             )
-        page.update()
     
-    def refresh_subtask_list():
+    def rebuild_subtask_list():
         subtask_list.controls.clear()
         
         if current_task_id:
             task = data_service.get_task(current_task_id)
             if task:
-                for i, subtask in enumerate(task["subtasks"]):
+                for path, subtask in iter_nodes(task["subtasks"]):
                     subtask_list.controls.append(
-                        ft.Container(
-                            content=ft.Row([
-                                ft.Checkbox(
-                                    value=subtask["done"],
-                                    on_change=lambda e, idx=i: toggle_subtask(idx)
-                                ),
-                                ft.Text(
-                                    subtask["name"],
-                                    expand=True,
-                                    size=13,
-                                    style=ft.TextStyle(
-                                        decoration=ft.TextDecoration.LINE_THROUGH 
-                                        if subtask["done"] else None,
-                                        color=colors.GREY if subtask["done"] else None
-                                    )
-                                ),
-                                ft.Text(f"{subtask['minutes']}min", 
-                                       size=11, color=colors.GREY_600),
-                                ft.IconButton(
-                                    icon=ft.Icons.CLOSE,
-                                    icon_size=14,
-                                    on_click=lambda e, idx=i: delete_subtask(idx)
-                                )
-                            ]),
-                            padding=6,
-                            border_radius=6,
-                            bgcolor=colors.GREEN_50 if subtask["done"] else colors.WHITE
-                        )
+                        subtask_row(path, subtask, toggle_subtask, delete_subtask)
                     )
                 update_progress(task)
-        page.update()
+    
+    def refresh_task_list():
+        scheduler.invalidate("tasks")
+    
+    def refresh_subtask_list():
+        scheduler.invalidate("subtasks")
+    
+    scheduler.register("tasks", rebuild_task_list)
+    scheduler.register("subtasks", rebuild_subtask_list)
     
     def update_progress(task: dict):
-        total = len(task["subtasks"])
-        done = sum(1 for s in task["subtasks"] if s["done"])
+        done, total = get_progress(task)
         
         progress_bar.value = done / total if total > 0 else 0
         progress_text.value = f"进度: {done}/{total}"
@@ -154,30 +139,47 @@ def main(page: ft.Page):
         if done == total and total > 0:
             progress_text.value += " 🎉"
     
+    def speculate(task_id: str):
+        """开启预先分解时，后台提前请求AI分解"""
+        if settings_service.settings.get("speculative_breakdown"):
+            task = data_service.get_task(task_id)
+            if task and not task["subtasks"]:
+                prefetch_service.speculate(
+                    task_id, task["name"],
+                    settings_service.settings.get("recursive_breakdown", False),
+                    settings_service.settings.get("split_minutes", 45)
+                )
+    
+    @scheduler.action("add_task")
     def add_task(e):
         nonlocal current_task_id
         if task_input.value.strip():
             task_id = data_service.add_task(task_input.value.strip())
+            speculate(task_id)
             current_task_id = task_id
             task_input.value = ""
             refresh_task_list()
             refresh_subtask_list()
             show_message("✅ 任务已创建")
     
+    @scheduler.action("select_task")
     def select_task(task_id: str):
         nonlocal current_task_id
         current_task_id = task_id
         refresh_task_list()
         refresh_subtask_list()
     
+    @scheduler.action("delete_task")
     def delete_task(task_id: str):
         nonlocal current_task_id
         data_service.delete_task(task_id)
+        prefetch_service.cancel(task_id)
         if current_task_id == task_id:
             current_task_id = None
         refresh_task_list()
         refresh_subtask_list()
     
+    @scheduler.action("add_subtask")
     def add_subtask(e):
         if current_task_id and subtask_input.value.strip():
             minutes = int(time_input.value or 25)
@@ -186,48 +188,80 @@ def main(page: ft.Page):
             refresh_subtask_list()
             refresh_task_list()
     
-    def toggle_subtask(index: int):
-        data_service.toggle_subtask(current_task_id, index)
+    @scheduler.action("toggle_subtask")
+    def toggle_subtask(path: list):
+        data_service.toggle_subtask(current_task_id, path)
         refresh_subtask_list()
         refresh_task_list()
     
-    def delete_subtask(index: int):
-        data_service.delete_subtask(current_task_id, index)
+    @scheduler.action("delete_subtask")
+    def delete_subtask(path: list):
+        data_service.delete_subtask(current_task_id, path)
         refresh_subtask_list()
         refresh_task_list()
     
-    def ai_break_down(e):
+    @scheduler.action("ai_break_down")
+    def start_ai_break_down():
+        """检查任务并显示状态；需要请求AI时返回 (任务ID, 任务名, 是否递归, 拆分分钟数)"""
         if not current_task_id:
             show_message("请先选择一个任务", colors.ORANGE)
-            return
-        
-        if not ai_service.is_available():
-            show_message("请先在设置中配置API", colors.ORANGE)
-            show_settings(None)
-            return
+            return None
         
         task = data_service.get_task(current_task_id)
         if not task:
-            return
-        
-        ai_status.value = "🤖 AI正在分析..."
-        page.update()
+            return None
         
-        result = ai_service.break_down_task(task["name"])
+        if not ai_service.is_available():
+            # 未配置API时直接使用离线模板，不再打断用户
+            result = ai_service.quick_break_down(task["name"])
+            subtasks = result["data"]["subtasks"]
+            data_service.add_subtasks_batch(current_task_id, subtasks)
+            outbox.discard(current_task_id)
+            ai_status.value = f"📦 已用离线模板生成 {len(subtasks)} 个步骤（配置API后可用AI分解）"
+            refresh_subtask_list()
+            refresh_task_list()
+            return None
         
+        ai_status.value = "🤖 AI正在分析..."   # 操作结束时显示，再开始请求
+        scheduler.request_update()
+        return (current_task_id, task["name"],
+                settings_service.settings.get("recursive_breakdown", False),
+                settings_service.settings.get("split_minutes", 45))
+    
+    @scheduler.action("ai_break_down_result")
+    def finish_ai_break_down(task_id: str, task_name: str, recursive: bool, split_minutes: int, result: dict):
         if result["success"]:
             subtasks = result["data"]["subtasks"]
-            data_service.add_subtasks_batch(current_task_id, subtasks)
+            data_service.add_subtasks_batch(task_id, subtasks)
+            outbox.discard(task_id)   # 之前排队的请求不再需要，避免网络恢复后重复生成
             ai_status.value = f"✅ 已生成 {len(subtasks)} 个步骤"
             refresh_subtask_list()
             refresh_task_list()
+        elif result.get("retryable"):
+            # 网络不可用：请求保存到离线队列，恢复后自动分解并刷新
+            outbox.enqueue(task_id, task_name, recursive, split_minutes)
+            ai_status.value = f"📮 网络不可用，已加入离线队列（{outbox.pending_count()} 个等待中）"
         else:
             ai_status.value = f"❌ {result['error'][:30]}..."
         
-        page.update()
+        scheduler.request_update()
+    
+    def ai_break_down(e):
+        # AI请求要几秒，放在两个操作之间：请求期间其他操作和后台刷新照常进行
+        request = start_ai_break_down()
+        if request is None:
+            return
+        task_id, task_name, recursive, split_minutes = request
+        result = prefetch_service.take(task_id, task_name, recursive)
+        if result is None and recursive:
+            result = ai_service.break_down_recursive(task_name, split_minutes, allow_offline=False)
+        elif result is None:
+            result = ai_service.break_down_task(task_name, allow_offline=False)
+        finish_ai_break_down(*request, result)
     
     # ============ 导入导出 ============
     
+    @scheduler.action("show_export_dialog")
     def show_export_dialog(e):
         export_text = data_service.get_export_string()
         
@@ -242,17 +276,21 @@ def main(page: ft.Page):
         )
         page.dialog = dialog
         dialog.open = True
-        page.update()
+        scheduler.request_update()
     
+    @scheduler.action("show_import_dialog")
     def show_import_dialog(e):
         import_field = ft.TextField(
             hint_text="粘贴导出的数据",
             multiline=True, min_lines=5, max_lines=8
         )
         
+        @scheduler.action("do_import")
         def do_import(e):
             result = data_service.import_from_string(import_field.value)
             if result["success"]:
+                for task_id in result["task_ids"]:
+                    speculate(task_id)
                 show_message(f"✅ 导入 {result['imported']} 个任务")
                 refresh_task_list()
                 close_dialog()
@@ -269,25 +307,43 @@ def main(page: ft.Page):
         )
         page.dialog = dialog
         dialog.open = True
-        page.update()
+        scheduler.request_update()
     
+    @scheduler.action("close_dialog")
     def close_dialog():
         page.dialog.open = False
-        page.update()
+        scheduler.request_update()
     
     # ============ 页面切换 ============
     
+    @scheduler.action("show_settings")
     def show_settings(e):
         main_content.controls.clear()
         main_content.controls.append(
-            create_settings_view(page, settings_service, ai_service, show_main)
+            create_settings_view(page, settings_service, ai_service, show_main,
+                                 server_mode=store_registry is not None)
+        )
+        scheduler.request_update()
+    
+    @scheduler.action("show_plan")
+    def show_plan(e):
+        main_content.controls.clear()
+        main_content.controls.append(
+            create_plan_view(page, schedule_service, settings_service, show_main)
         )
-        page.update()
+        scheduler.request_update()
     
+    @scheduler.action("show_stats")
+    def show_stats(e):
+        main_content.controls.clear()
+        main_content.controls.append(create_stats_view(page, data_service, show_main))
+        scheduler.request_update()
+    
+    @scheduler.action("show_main")
     def show_main(e):
         main_content.controls.clear()
         main_content.controls.append(home_view)
-        page.update()
+        scheduler.request_update()
     
     # ============ 主页面布局 ============
     
@@ -308,6 +364,10 @@ def main(page: ft.Page):
                                  on_click=show_import_dialog),
                     ft.IconButton(icon=ft.Icons.DOWNLOAD, tooltip="导出", 
                                  on_click=show_export_dialog),
+                    ft.IconButton(icon=ft.Icons.CALENDAR_MONTH, tooltip="计划",
+                                 on_click=show_plan),
+                    ft.IconButton(icon=ft.Icons.INSIGHTS, tooltip="统计",
+                                 on_click=show_stats),
                     ft.IconButton(icon=ft.Icons.SETTINGS, tooltip="设置",
                                  on_click=show_settings),
                 ], spacing=0)
@@ -368,6 +428,35 @@ def main(page: ft.Page):
     main_content.controls.append(home_view)
     page.add(main_content)
     refresh_task_list()
+    data_service.start_background_migration()
+    
+    # ============ 多实例同步 ============
+    # 其他实例（桌面版/网页版）或共享同一分片的其他会话写入后自动刷新；
+    # 只比较文件 stat 和数据版本，没变化时不解析
+    
+    stop_watching = threading.Event()
+    
+    def watch_data_file():
+        while not stop_watching.wait(1.0):
+            try:
+                data_service.reload_if_changed()
+                if data_service.generation != seen_generation:
+                    refresh_task_list()
+                    refresh_subtask_list()
+            except Exception as e:
+                print(f"同步数据失败: {e}")
+    
+    def on_close(e):
+        stop_watching.set()
+        prefetch_service.shutdown()
+        schedule_service.close()
+        if store_registry:
+            store_registry.release(user_id)
+        else:
+            outbox.stop()
+    
+    page.on_close = on_close
+    threading.Thread(target=watch_data_file, daemon=True).start()
     
     if not settings_service.is_api_configured():
         page.snack_bar = ft.SnackBar(
@@ -378,4 +467,13 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    if "--web" in sys.argv:
+        # 网页服务模式: python main.py --web [端口] [--host 地址]，访问 http://host:端口/?user=名字
+        # ?user= 不是登录验证，任何能访问的人都能打开任意用户的数据，所以默认只监听本机
+        args = sys.argv[sys.argv.index("--web") + 1:]
+        port = int(args[0]) if args and args[0].isdigit() else 8550
+        host = args[args.index("--host") + 1] if "--host" in args[:-1] else "127.0.0.1"
+        store_registry = StoreRegistry()
+        ft.app(target=main, view=ft.AppView.WEB_BROWSER, host=host, port=port)
+    else:
+        ft.app(target=main)
\ No newline at end of file
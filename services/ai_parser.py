@@ -0,0 +1,121 @@
+"""
+AI 返回结果解析 - 从不规范的输出中提取子任务列表
+"""
+
+import json
+from typing import Optional
+
+_decoder = json.JSONDecoder()
+
+
+class ParseResult:
+    """解析结果：subtasks 为 None 表示失败，fragment 是用于修复重问的片段"""
+
+    def __init__(self, subtasks: Optional[list] = None, error: str = "", fragment: str = ""):
+        self.subtasks = subtasks
+        self.error = error
+        self.fragment = fragment
+
+    @property
+    def success(self) -> bool:
+        return self.subtasks is not None
+
+
+def _to_minutes(value) -> Optional[int]:
+    """分钟数必须是正整数（允许 "15"、15.0 这类写法）"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip().rstrip("分钟min").strip()
+        if not value.isdigit():
+            return None
+        value = int(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and value > 0:
+        return value
+    return None
+
+
+def validate_subtasks(items) -> tuple:
+    """校验子任务列表，返回 (规范化后的列表, 错误信息)"""
+    if not isinstance(items, list) or not items:
+        return None, "subtasks 必须是非空数组"
+
+    subtasks = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return None, f"第{i + 1}个步骤不是对象"
+        name = item.get("name")
+        if not isinstance(name, str) or not name.strip():
+            return None, f"第{i + 1}个步骤缺少名称"
+        minutes = _to_minutes(item.get("minutes"))
+        if minutes is None:
+            return None, f"第{i + 1}个步骤的分钟数无效: {item.get('minutes')!r}"
+        subtasks.append({"name": name.strip(), "minutes": minutes})
+    return subtasks, ""
+
+
+def _candidate_items(value):
+    """从解析出的 JSON 值中找子任务数组"""
+    if isinstance(value, dict):
+        if "subtasks" in value:
+            return value["subtasks"]
+        # 有的模型会多包一层，如 {"data": {"subtasks": [...]}}
+        for inner in value.values():
+            if isinstance(inner, dict) and "subtasks" in inner:
+                return inner["subtasks"]
+        return None
+    if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        return value
+    return None
+
+
+def _iter_candidates(value):
+    """value 本身和嵌套在其中的所有子任务数组候选（外层优先）"""
+    items = _candidate_items(value)
+    if items is not None:
+        yield items
+    children = value.values() if isinstance(value, dict) else value if isinstance(value, list) else ()
+    for child in children:
+        if isinstance(child, (dict, list)):
+            yield from _iter_candidates(child)
+
+
+def extract_subtasks(text: str) -> ParseResult:
+    """从模型输出中提取第一个合法的子任务数组
+
+    能处理 markdown 代码块、前后的解释文字、多个 JSON 片段等情况。
+    """
+    if not text or not text.strip():
+        return ParseResult(error="AI返回内容为空")
+
+    first_error = ""
+    first_json_pos = -1
+    pos = 0
+    while True:
+        starts = [p for p in (text.find("{", pos), text.find("[", pos)) if p != -1]
+        if not starts:
+            break
+        start = min(starts)
+        if first_json_pos == -1:
+            first_json_pos = start
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except ValueError:
+            pos = start + 1
+            continue
+
+        # 跳过整个值之前先找嵌套在里面的数组，如 [1, 2, {"subtasks": [...]}]
+        for items in _iter_candidates(value):
+            subtasks, error = validate_subtasks(items)
+            if subtasks is not None:
+                return ParseResult(subtasks)
+            first_error = first_error or error
+        pos = end
+
+    if first_error:
+        return ParseResult(error=first_error, fragment=text[first_json_pos:].strip())
+    if first_json_pos == -1:
+        return ParseResult(error="AI返回内容中没有JSON", fragment=text.strip())
+    return ParseResult(error="AI返回的JSON格式有误", fragment=text[first_json_pos:].strip())
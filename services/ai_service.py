@@ -2,16 +2,82 @@
 AI服务 - 处理任务智能分解
 """
 
-from openai import OpenAI
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Optional
+
+from openai import (
+    OpenAI, DefaultHttpxClient,
+    BadRequestError, APIConnectionError, InternalServerError, RateLimitError
+)
 from services.settings_service import SettingsService
+from services.ai_parser import extract_subtasks
+from services.offline_breakdown import OfflineBreakdownEngine
+from services.telemetry_service import AITelemetry
+from services.profiler import profiler
+
+# 系统提示词的版本，修改 system_prompt 时加 1（离线队列会记录请求时的版本）
+PROMPT_VERSION = 1
+
+# 支持 response_format={"type": "json_object"} 的服务商（自定义服务商先尝试，失败后自动关闭）
+JSON_MODE_PROVIDERS = {"openai", "deepseek", "zhipu", "moonshot", "custom"}
+
+class RetryPolicy:
+    """重试和指数退避策略"""
+    
+    def __init__(self, max_attempts: int = 5, base_delay: float = 2.0,
+                 max_delay: float = 300.0, jitter: float = 0.2):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+    
+    def should_retry(self, attempt: int) -> bool:
+        """第 attempt 次失败后是否还要重试"""
+        return attempt < self.max_attempts
+    
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次失败后等待多少秒（带随机抖动，避免同时重试）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
 
 class AIService:
-    def __init__(self, settings_service: SettingsService):
+    def __init__(self, settings_service: SettingsService,
+                 offline_engine: Optional[OfflineBreakdownEngine] = None,
+                 telemetry: Optional[AITelemetry] = None):
         self.settings_service = settings_service
+        self.offline_engine = offline_engine   # 未配置API或服务商无法访问时的本地兜底
+        self.telemetry = telemetry             # 记录每次调用的延迟、token和错误
+        self._call_state = threading.local()   # 当前线程正在进行的调用（HTTP钩子使用）
         self.client = None
         self.model = None
+        self.json_mode = False
+        self.retry_policy = RetryPolicy()
         self._init_client()
         
+        # 递归分解时所有并发请求共用的名额
+        self.max_concurrency = 4
+        self._request_slots = threading.BoundedSemaphore(self.max_concurrency)
+        
+        # 调用统计：失败率和浪费的token（递归分解、预取和批处理会在多个线程中更新）
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,            # 分解请求次数
+            "failed_calls": 0,     # 最终失败次数
+            "repairs": 0,          # 发起修复重问的次数
+            "repaired": 0,         # 修复成功次数
+            "wasted_tokens": 0,    # 结果不可用的响应消耗的token
+        }
+        
+        # 修复重问的提示词（只发送出错的片段）
+        self.repair_prompt = """下面是一段格式有误的JSON，请修复后只返回合法的JSON，不要有其他内容。
+格式要求：{"subtasks": [{"name": "步骤名称", "minutes": 正整数分钟数}]}，name 不能为空。"""
+        
         # 系统提示词
         self.system_prompt = """你是一个任务分解专家，专门帮助用户克服拖延症。
 
@@ -45,9 +111,15 @@ class AIService:
         try:
             self.client = OpenAI(
                 api_key=config["api_key"],
-                base_url=config["base_url"]
+                base_url=config["base_url"],
+                timeout=self.settings_service.settings.get("request_timeout", 60),
+                http_client=DefaultHttpxClient(event_hooks={
+                    "request": [self._on_http_request],
+                    "response": [self._on_http_response],
+                })
             )
             self.model = config["model"]
+            self.json_mode = self.settings_service.settings.get("ai_provider") in JSON_MODE_PROVIDERS
         except Exception as e:
             print(f"初始化AI客户端失败: {e}")
             self.client = None
@@ -66,44 +138,233 @@ class AIService:
             return {"success": False, "error": "API未配置"}
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "测试连接，请回复OK"}],
+            self._chat(
+                [{"role": "user", "content": "测试连接，请回复OK"}],
                 max_tokens=10
             )
             return {"success": True, "message": "连接成功！"}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def break_down_task(self, task: str) -> dict:
-        """调用AI分解任务"""
+    def _on_http_request(self, request):
+        state = self._call_state
+        if getattr(state, "active", False):
+            state.attempts += 1
+            state.attempt_start = time.perf_counter()
+    
+    def _on_http_response(self, response):
+        # 收到响应头时触发，用来计算首字节时间（重试时以最后一次为准）
+        state = self._call_state
+        if getattr(state, "active", False):
+            state.ttfb_ms = (time.perf_counter() - state.attempt_start) * 1000
+    
+    def _create(self, **kwargs):
+        """调用 chat.completions.create 并记录统计"""
+        if self.telemetry is None:
+            return self.client.chat.completions.create(model=self.model, **kwargs)
+        
+        state = self._call_state
+        state.active, state.attempts, state.ttfb_ms = True, 0, None
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(model=self.model, **kwargs)
+        except Exception as e:
+            state.active = False
+            self._record_call(start, state.ttfb_ms, state.attempts, None, type(e).__name__)
+            raise
+        state.active = False
+        if kwargs.get("stream"):
+            # 流式响应在读完后才记录，总延迟包含整个流（create 返回时只收到了响应头）
+            return self._timed_stream(response, start, state.ttfb_ms, state.attempts)
+        self._record_call(start, state.ttfb_ms, state.attempts, getattr(response, "usage", None), None)
+        return response
+    
+    def _timed_stream(self, stream, start: float, ttfb_ms, attempts: int):
+        """逐块转发流式响应，流结束、出错或被关闭时记录统计"""
+        usage, error = None, None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage   # 开启 include_usage 时最后一块带用量
+                yield chunk
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record_call(start, ttfb_ms, attempts, usage, error)
+    
+    def _record_call(self, start: float, ttfb_ms, attempts: int, usage, error):
+        self.telemetry.record(
+            provider=self.settings_service.settings.get("ai_provider", ""),
+            model=self.model or "",
+            latency_ms=(time.perf_counter() - start) * 1000,
+            ttfb_ms=ttfb_ms,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            retries=max(0, attempts - 1),
+            error=error
+        )
+    
+    def _chat(self, messages: list, json_output: bool = False, **kwargs):
+        """调用 chat.completions，json_output 时在支持的服务商上开启 JSON 模式"""
+        if json_output and self.json_mode:
+            try:
+                return self._create(
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    **kwargs
+                )
+            except BadRequestError as e:
+                if not self._is_json_mode_error(e):
+                    raise   # 上下文过长、模型不存在等与 JSON 模式无关的错误
+                # 服务商不支持 JSON 模式，之后不再尝试
+                self.json_mode = False
+        return self._create(messages=messages, **kwargs)
+    
+    @staticmethod
+    def _is_json_mode_error(error: BadRequestError) -> bool:
+        """400 错误是否是服务商不支持 response_format 引起的"""
+        if getattr(error, "param", None) == "response_format":
+            return True
+        text = f"{error} {getattr(error, 'body', '')}".lower()
+        return "response_format" in text or "json_object" in text
+    
+    def _count(self, name: str, value: int = 1):
+        with self._metrics_lock:
+            self.metrics[name] += value
+    
+    @staticmethod
+    def _total_tokens(response) -> int:
+        usage = getattr(response, "usage", None)
+        return getattr(usage, "total_tokens", 0) or 0
+    
+    def get_metrics(self) -> dict:
+        """获取调用统计"""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics["failure_rate"] = (
+            metrics["failed_calls"] / metrics["calls"] if metrics["calls"] else 0.0
+        )
+        return metrics
+
+    def quick_break_down(self, task: str) -> Optional[dict]:
+        """离线引擎立即给出的分解结果（毫秒级，没有离线引擎时返回 None）"""
+        if self.offline_engine is None:
+            return None
+        return self.offline_engine.break_down(task)
+    
+    @profiler.timed("ai.break_down")
+    def break_down_task(self, task: str, allow_offline: bool = True) -> dict:
+        """调用AI分解任务
+        
+        未配置API或服务商无法访问时，如果有离线引擎且 allow_offline，
+        返回离线结果（带 "source": "offline"）
+        """
         if not self.client:
+            if allow_offline and self.offline_engine:
+                return self.quick_break_down(task)
             return {"success": False, "error": "请先在设置中配置API密钥"}
         
+        self._count("calls")
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = self._chat(
+                [
                     {"role": "system", "content": self.system_prompt},
                     {"role": "user", "content": f"请帮我分解这个任务：{task}"}
                 ],
+                json_output=True,
                 temperature=0.7,
                 max_tokens=1000
             )
+            parsed = extract_subtasks(response.choices[0].message.content)
+            if parsed.success:
+                return {"success": True, "data": {"subtasks": parsed.subtasks}}
             
-            import json
-            content = response.choices[0].message.content
-            
-            # 清理markdown代码块
-            content = content.strip()
-            if content.startswith("```"):
-                content = content.split("\n", 1)[1]
-            if content.endswith("```"):
-                content = content.rsplit("```", 1)[0]
-            content = content.strip()
+            # 只把出错的片段发回去修复，不重新分解
+            self._count("wasted_tokens", self._total_tokens(response))
+            self._count("repairs")
+            repair = self._chat(
+                [
+                    {"role": "system", "content": self.repair_prompt},
+                    {"role": "user", "content": parsed.fragment[:2000]}
+                ],
+                json_output=True,
+                temperature=0,
+                max_tokens=1000
+            )
+            repaired = extract_subtasks(repair.choices[0].message.content)
+            if repaired.success:
+                self._count("repaired")
+                return {"success": True, "data": {"subtasks": repaired.subtasks}}
             
-            result = json.loads(content)
-            return {"success": True, "data": result}
+            self._count("wasted_tokens", self._total_tokens(repair))
+            self._count("failed_calls")
+            return {"success": False, "error": repaired.error}
             
+        except (APIConnectionError, InternalServerError, RateLimitError) as e:
+            # 网络或服务商的临时故障，可以稍后重试
+            self._count("failed_calls")
+            if allow_offline and self.offline_engine:
+                result = self.quick_break_down(task)
+                result["remote_error"] = str(e)
+                return result
+            return {
+                "success": False,
+                "error": str(e),
+                "retryable": True,
+                "unreachable": isinstance(e, APIConnectionError)
+            }
         except Exception as e:
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            self._count("failed_calls")
+            return {"success": False, "error": str(e)}
+
+    def _break_down_limited(self, task: str) -> dict:
+        """受全局并发名额限制的分解请求（子步骤不使用离线模板）"""
+        with self._request_slots:
+            return self.break_down_task(task, allow_offline=False)
+    
+    def break_down_recursive(self, task: str, split_minutes: int = 45,
+                             max_depth: int = 3, max_requests: int = 20,
+                             allow_offline: bool = True) -> dict:
+        """递归分解：超过 split_minutes 的步骤继续拆分
+        
+        同一层的请求并发执行（受 max_concurrency 限制），
+        名称相同的步骤只请求一次，总请求数不超过 max_requests。
+        返回的步骤可能带 children。
+        """
+        result = self.break_down_task(task, allow_offline)
+        if not result["success"] or result.get("source") == "offline":
+            return result
+        
+        subtasks = result["data"]["subtasks"]
+        requests = 1
+        cache = {}   # 规范化的步骤名 -> Future
+        frontier = [st for st in subtasks if st["minutes"] > split_minutes]
+        depth = 1
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            while frontier and depth < max_depth:
+                pending = []
+                for step in frontier:
+                    key = re.sub(r"[\s\W_]+", "", step["name"]).lower()
+                    if key not in cache:
+                        if requests >= max_requests:
+                            continue
+                        prompt = f"{step['name']}（这是任务「{task}」中的一步，预计{step['minutes']}分钟）"
+                        cache[key] = pool.submit(self._break_down_limited, prompt)
+                        requests += 1
+                    pending.append((step, cache[key]))
+                
+                next_frontier = []
+                for step, future in pending:
+                    child = future.result()
+                    # 拆不开（只返回一步）或失败的步骤保持原样
+                    if not child["success"] or len(child["data"]["subtasks"]) < 2:
+                        continue
+                    step["children"] = [dict(c) for c in child["data"]["subtasks"]]
+                    next_frontier.extend(
+                        c for c in step["children"] if c["minutes"] > split_minutes
+                    )
+                frontier = next_frontier
+                depth += 1
+        
+        return {"success": True, "data": {"subtasks": subtasks}, "requests": requests}
@@ -0,0 +1,111 @@
+"""
+本地 HTTP API - 供脚本和其他工具批量操作任务（JSON 格式）
+
+接口:
+    GET    /tasks                  所有任务
+    GET    /tasks/<id>             单个任务
+    DELETE /tasks/<id>             删除任务
+    POST   /tasks/batch            {"tasks": [...]}  批量创建
+    POST   /subtasks/done          {"items": [...]}  批量标记完成
+    POST   /tasks/breakdown        {"task_ids": [...], "workers": 4}  批量AI分解
+    GET    /export                 导出数据
+    POST   /import                 导出格式的数据，合并导入
+
+POST 请求必须带 Content-Type: application/json（防止网页跨域提交）。
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.batch_service import BatchService
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    batch_service: BatchService = None
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw.decode("utf-8"))
+
+    def _task_id(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "tasks":
+            return parts[1]
+        return None
+
+    def do_GET(self):
+        data_service = self.batch_service.data_service
+        if self.path == "/tasks":
+            self._send_json(200, data_service.get_all_tasks())
+        elif self.path == "/export":
+            self._send_json(200, json.loads(data_service.get_export_string()))
+        elif self._task_id():
+            task = data_service.get_task(self._task_id())
+            if task is None:
+                self._send_json(404, {"success": False, "error": "任务不存在"})
+            else:
+                self._send_json(200, task)
+        else:
+            self._send_json(404, {"success": False, "error": "未知接口"})
+
+    def do_DELETE(self):
+        task_id = self._task_id()
+        if not task_id:
+            self._send_json(404, {"success": False, "error": "未知接口"})
+            return
+        self.batch_service.data_service.delete_task(task_id)
+        self._send_json(200, {"success": True})
+
+    def do_POST(self):
+        # 只接受 JSON：浏览器不经过预检就能跨域发送的表单/纯文本请求一律拒绝
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json(415, {"success": False, "error": "Content-Type 必须是 application/json"})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"success": False, "error": f"无效的JSON: {e}"})
+            return
+        if not isinstance(body, dict):
+            self._send_json(400, {"success": False, "error": "请求体必须是JSON对象"})
+            return
+
+        try:
+            if self.path == "/tasks/batch":
+                result = self.batch_service.create_tasks(body.get("tasks", []))
+            elif self.path == "/subtasks/done":
+                result = self.batch_service.set_done(body.get("items", []))
+            elif self.path == "/tasks/breakdown":
+                result = self.batch_service.break_down(body.get("task_ids"), body.get("workers", 4))
+            elif self.path == "/import":
+                result = self.batch_service.data_service.import_from_string(
+                    json.dumps(body, ensure_ascii=False)
+                )
+            else:
+                self._send_json(404, {"success": False, "error": "未知接口"})
+                return
+        except Exception as e:
+            self._send_json(500, {"success": False, "error": f"处理请求失败: {e}"})
+            return
+        self._send_json(200 if result["success"] else 400, result)
+
+    def log_message(self, format, *args):
+        # 默认会输出每个请求到 stderr，批量脚本调用时太吵
+        pass
+
+
+def create_server(batch_service: BatchService, host: str = "127.0.0.1",
+                  port: int = 8765) -> ThreadingHTTPServer:
+    """创建 HTTP 服务（调用 serve_forever() 启动）"""
+    handler = type("ApiHandler", (_ApiHandler,), {"batch_service": batch_service})
+    return ThreadingHTTPServer((host, port), handler)
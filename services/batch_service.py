@@ -0,0 +1,119 @@
+"""
+批量操作服务 - 命令行和本地 HTTP API 共用的批处理逻辑
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from services.data_service import DataService
+from services.ai_service import AIService
+from services.task_tree import parse_path
+
+
+class BatchService:
+    def __init__(self, data_service: DataService, ai_service: Optional[AIService] = None):
+        self.data_service = data_service
+        self.ai_service = ai_service
+
+    @staticmethod
+    def _parse_tasks(tasks) -> list:
+        """检查并整理 create_tasks 的输入，格式不对时抛出 ValueError"""
+        if not isinstance(tasks, list):
+            raise ValueError("tasks 必须是列表")
+        items = []
+        for i, task in enumerate(tasks):
+            if isinstance(task, str):
+                task = {"name": task}
+            if not isinstance(task, dict):
+                raise ValueError(f"第{i + 1}个任务必须是字符串或对象")
+            name = str(task.get("name", "")).strip()
+            if not name:
+                continue
+            subtasks = task.get("subtasks", [])
+            if not isinstance(subtasks, list):
+                raise ValueError(f"任务「{name}」的 subtasks 必须是列表")
+            parsed = []
+            for st in subtasks:
+                if not isinstance(st, dict):
+                    raise ValueError(f"任务「{name}」的子任务必须是对象")
+                if not st.get("name"):
+                    continue
+                minutes = st.get("minutes", 25)
+                if isinstance(minutes, bool) or not isinstance(minutes, (int, float, str)):
+                    raise ValueError(f"子任务「{st['name']}」的 minutes 必须是数字")
+                try:
+                    minutes = int(minutes)
+                except (ValueError, OverflowError):
+                    raise ValueError(f"子任务「{st['name']}」的 minutes 必须是数字") from None
+                if minutes <= 0:
+                    raise ValueError(f"子任务「{st['name']}」的 minutes 必须大于0")
+                parsed.append({"name": str(st["name"]), "minutes": minutes})
+            items.append({"name": name, "subtasks": parsed})
+        return items
+
+    def create_tasks(self, tasks: list) -> dict:
+        """批量创建任务
+
+        tasks 中每一项可以是任务名字符串，或 {"name": ..., "subtasks": [...]}
+        """
+        try:
+            items = self._parse_tasks(tasks)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+        task_ids = self.data_service.add_tasks_batch(items)
+        return {"success": True, "created": len(task_ids), "task_ids": task_ids}
+
+    def set_done(self, items: list) -> dict:
+        """批量标记完成
+
+        items: [{"task_id": ..., "index": 子任务序号, "done": True}]
+        index 可以是顶层序号、序号列表或 "2.0" 形式的路径（第3步的第1个子步骤）
+        """
+        if not isinstance(items, list):
+            return {"success": False, "updated": 0, "errors": [{"item": items, "error": "items 必须是列表"}]}
+        updated, errors = 0, []
+        with self.data_service.batch():
+            for item in items:
+                try:
+                    self.data_service.set_subtask_done(
+                        item["task_id"], parse_path(item["index"]), bool(item.get("done", True))
+                    )
+                    updated += 1
+                except (KeyError, IndexError, ValueError, TypeError) as e:
+                    errors.append({"item": item, "error": f"无效的子任务: {e}"})
+        return {"success": not errors, "updated": updated, "errors": errors}
+
+    def break_down(self, task_ids: Optional[list] = None, workers: int = 4) -> dict:
+        """批量AI分解（并发请求，结果统一写入一次）
+
+        task_ids 为空时分解所有还没有子任务的任务
+        """
+        if task_ids is not None and (
+                not isinstance(task_ids, list) or not all(isinstance(tid, str) for tid in task_ids)):
+            return {"success": False, "error": "task_ids 必须是任务ID列表"}
+        if isinstance(workers, bool) or not isinstance(workers, int) or not 1 <= workers <= 32:
+            return {"success": False, "error": "workers 必须是 1-32 的整数"}
+        if not self.ai_service or not self.ai_service.is_available():
+            return {"success": False, "error": "请先在设置中配置API密钥"}
+
+        tasks = self.data_service.get_all_tasks()
+        if task_ids is None:
+            task_ids = [tid for tid, task in tasks.items() if not task["subtasks"]]
+        targets = [(tid, tasks[tid]["name"]) for tid in task_ids if tid in tasks]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(
+                # 不用离线模板：服务商故障时报错，而不是把通用步骤当作AI结果写入
+                lambda target: self.ai_service.break_down_task(target[1], allow_offline=False), targets
+            ))
+
+        done, errors = 0, []
+        with self.data_service.batch():
+            for (task_id, _), result in zip(targets, results):
+                if result["success"]:
+                    self.data_service.add_subtasks_batch(task_id, result["data"]["subtasks"])
+                    done += 1
+                else:
+                    errors.append({"task_id": task_id, "error": result["error"]})
+        return {"success": not errors, "broken_down": done, "errors": errors}
@@ -1,98 +1,513 @@
 """
 数据服务 - 处理数据的保存、导入、导出
+
+并发模型：
+- 写操作在事务中串行执行（线程锁 + 跨进程文件锁），修改的是草稿副本，
+  只有被修改的任务会被复制（写时复制），提交后整体替换为新的快照
+- 读操作直接拿当前快照，不加锁、不会被写操作阻塞；快照发布后不再修改，
+  调用方也不应修改拿到的数据
 """
 
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional
 
+from services import migrations, productivity, snapshot_format, task_tree
+from services.file_lock import FileLock
+from services.profiler import profiler
+
+
+def _copy_json(value):
+    """复制 JSON 结构（比 copy.deepcopy 快）"""
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+
+def _serializable(data: dict) -> dict:
+    """写文件、导出用的数据：统计换成普通字典（见 productivity.Buckets）"""
+    if "stats" not in data:
+        return data
+    return dict(data, stats=productivity.plain(data["stats"]))
+
+
+class Snapshot:
+    """某个版本的只读数据"""
+    __slots__ = ("version", "data")
+    
+    def __init__(self, version: int, data: dict):
+        self.version = version
+        self.data = data
+    
+    @property
+    def tasks(self) -> dict:
+        return self.data["tasks"]
+
+
 class DataService:
-    def __init__(self, data_file: str = "data/tasks.json"):
+    def __init__(self, data_file: str = "data/tasks.json", binary_snapshot: bool = False):
         self.data_file = data_file
+        # 二进制快照：和 JSON 一起写入，启动时只读索引（见 snapshot_format）
+        self.binary_snapshot = binary_snapshot
+        self.snapshot_file = data_file + ".snap"
+        self._encoded = {}            # 快照中任务的编码缓存 {任务ID: (任务对象, 字节)}
+        self.lock = FileLock(data_file + ".lock")
+        self._thread_lock = threading.RLock()   # 多个线程/会话共享同一实例时串行化写入
+        self._file_signature = None   # 最近一次读/写时文件的 (mtime, size, inode)
+        self._tx_depth = 0
+        self._tx_owner = None         # 正在执行写事务的线程
+        self._draft = None            # 写事务中的草稿数据
+        self._copied = set()          # 本次事务中已经复制过的任务ID
+        self._stats_copied = False    # 本次事务中是否已经复制过统计
+        self._stats_cache = None      # (快照版本, 内存中回填的统计)
+        self._migrated = {}           # 任务ID -> (快照中的旧记录, 升级后的副本)
+        self._all_tasks_cache = None  # (快照版本, 升级后的任务字典)
+        self._migration_thread = None
+        self._listeners = []          # 数据变化时调用 listener(changed_task_ids)
         self._ensure_data_dir()
-        self.data = self._load_data()
+        self._snapshot = Snapshot(1, self._load_data())
+        if binary_snapshot and self._file_signature is not None \
+                and not isinstance(self._snapshot.tasks, snapshot_format.LazyTasks):
+            # 快照不存在或已过期：现在补写，下次启动就能用上
+            with self._thread_lock, self.lock:
+                if not self.has_external_changes():
+                    self._write_snapshot(self._snapshot.data)
+    
+    @property
+    def data(self) -> dict:
+        """当前数据：写事务所在线程看到草稿，其他线程看到已发布的快照"""
+        if self._tx_owner == threading.get_ident():
+            return self._draft
+        return self._snapshot.data
+    
+    @property
+    def generation(self) -> int:
+        """数据版本，每次写入或重新加载加 1"""
+        return self._snapshot.version
+    
+    def snapshot(self) -> Snapshot:
+        """获取当前快照（不加锁，之后的写入不会影响它）"""
+        return self._snapshot
+    
+    def _publish(self, data: dict):
+        self._snapshot = Snapshot(self._snapshot.version + 1, data)
+    
+    def add_listener(self, listener):
+        """注册数据变化的回调 listener(changed_task_ids)
+        
+        changed_task_ids 是新增、修改或删除的任务ID集合；
+        重新加载了其他实例写入的文件时为 None（全部可能变化）。
+        回调在写入线程上、释放锁之后调用。
+        """
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def _notify(self, changed_task_ids):
+        for listener in list(self._listeners):
+            try:
+                listener(changed_task_ids)
+            except Exception as e:
+                print(f"数据变化回调失败: {e}")
     
     def _ensure_data_dir(self):
         """确保数据目录存在"""
         os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
     
+    def _get_file_signature(self) -> Optional[tuple]:
+        """文件的变化特征，用于低成本判断是否被其他实例修改"""
+        try:
+            st = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
     def _load_data(self) -> dict:
         """从文件加载数据"""
+        self._file_signature = self._get_file_signature()
+        if self.binary_snapshot and self._file_signature is not None:
+            with profiler.span("data.load_snapshot"):
+                data = snapshot_format.load(self.snapshot_file, self._file_signature)
+            if data is not None:
+                return data
+        data = {"tasks": {}, "settings": {}}
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                    data = json.load(f)
             except:
-                return {"tasks": {}, "settings": {}}
-        return {"tasks": {}, "settings": {}}
+                pass
+        # 旧版本的记录不在加载时迁移，访问时按需升级（见 get_task）
+        return data
+    
+    def _write(self, data: dict):
+        """写入文件（先写临时文件再替换，避免其他实例读到半个文件）"""
+        data = _serializable(data)
+        tmp_file = self.data_file + ".tmp"
+        with profiler.span("data.save"):
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.data_file)
+        self._file_signature = self._get_file_signature()
+        if self.binary_snapshot:
+            self._write_snapshot(data)
+    
+    def _write_snapshot(self, data: dict):
+        """写入二进制快照（失败不影响 JSON，过期的快照加载时会被忽略）"""
+        try:
+            with profiler.span("data.save_snapshot"):
+                snapshot_format.write(self.snapshot_file, data, self._file_signature, self._encoded)
+        except Exception as e:
+            print(f"写入快照失败: {e}")
     
     def save(self):
         """保存数据到文件"""
-        with open(self.data_file, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        with self._thread_lock, self.lock:
+            self._write(self.data)
+    
+    def has_external_changes(self) -> bool:
+        """文件是否被其他实例修改过（只比较 stat，不解析文件）"""
+        return self._get_file_signature() != self._file_signature
+    
+    def reload_if_changed(self) -> bool:
+        """其他实例写入后重新加载，返回是否发生了重新加载"""
+        if not self.has_external_changes():
+            return False
+        with self._thread_lock, self.lock:
+            if self._tx_depth or not self.has_external_changes():
+                return False
+            self._publish(self._load_data())
+        self._notify(None)
+        return True
+    
+    @contextmanager
+    def _transaction(self):
+        """写事务：加锁 → 合并其他实例的修改 → 修改草稿 → 保存 → 发布新快照
+        
+        嵌套调用时只有最外层加锁和保存；出错时草稿直接丢弃。
+        """
+        changed = reloaded = False
+        with self._thread_lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield
+                finally:
+                    self._tx_depth -= 1
+                return
+            
+            with self.lock:
+                if self.has_external_changes():
+                    self._publish(self._load_data())
+                    reloaded = True
+                base = self._snapshot.data
+                self._draft = dict(base)
+                self._draft["tasks"] = base["tasks"].copy()   # 快照加载的任务复制后仍按需解码
+                self._copied = set()
+                self._stats_copied = False
+                if "stats" not in self._draft:
+                    # 第一次写入时从现有任务回填统计（只需一次）
+                    self._draft["stats"] = productivity.backfill(self._draft["tasks"])
+                    self._stats_copied = True
+                self._tx_depth = 1
+                self._tx_owner = threading.get_ident()
+                try:
+                    yield
+                    self._draft["schema_version"] = migrations.SCHEMA_VERSION
+                    self._write(self._draft)
+                    if self._listeners and not reloaded:
+                        # 只比较对象是否相同：修改过的任务都是新的副本
+                        changed = snapshot_format.changed_ids(base["tasks"], self._draft["tasks"])
+                    self._publish(self._draft)
+                finally:
+                    self._tx_depth = 0
+                    self._tx_owner = None
+                    self._draft = None
+                    self._copied = set()
+                    self._stats_copied = False
+        if self._listeners and (reloaded or changed):
+            self._notify(None if reloaded else changed)
+    
+    def _mutable_task(self, task_id: str) -> Optional[dict]:
+        """写事务中获取可修改的任务（第一次修改时从快照复制，并升级到当前版本）"""
+        task = self._draft["tasks"].get(task_id)
+        if task is not None and task_id not in self._copied:
+            task = migrations.upgrade_task(_copy_json(task))
+            self._draft["tasks"][task_id] = task
+            self._copied.add(task_id)
+        return task
+    
+    def _mutable_stats(self) -> dict:
+        """写事务中获取可修改的统计（只复制改过的汇总，见 productivity.Buckets）"""
+        if not self._stats_copied:
+            stats = self._draft["stats"]
+            self._draft["stats"] = {
+                "daily": productivity.derive(stats["daily"]),
+                "weekly": productivity.derive(stats["weekly"]),
+            }
+            self._stats_copied = True
+        return self._draft["stats"]
+    
+    def _record_completion(self, task: dict, leaves: list, done: bool):
+        """记录步骤完成时间并更新统计（写事务中调用）"""
+        stats = self._mutable_stats()
+        now = datetime.now()
+        for leaf in leaves:
+            if done:
+                leaf["done_at"] = now.isoformat()
+                # 一次只完成一步时，用和上一步的间隔估算实际用时
+                gap = productivity.timed_gap(task.get("last_done_at"), now) if len(leaves) == 1 else None
+                if gap is not None:
+                    leaf["actual_minutes"] = gap
+                productivity.record_done(stats, leaf)
+            else:
+                productivity.record_done(stats, leaf, -1)
+                leaf.pop("done_at", None)
+                leaf.pop("actual_minutes", None)
+        if done and leaves:
+            task["last_done_at"] = now.isoformat()
+    
+    def _read_task(self, task_id: str, task: dict) -> dict:
+        """读取时按需升级旧版本记录（升级结果缓存，不修改快照）"""
+        if not migrations.needs_migration(task):
+            return task
+        cached = self._migrated.get(task_id)
+        if cached is None or cached[0] is not task:
+            cached = (task, migrations.upgrade_task(_copy_json(task)))
+            self._migrated[task_id] = cached
+        return cached[1]
+    
+    def migrate_pending(self, batch_size: int = 200) -> int:
+        """把最多 batch_size 条旧版本记录升级并保存，返回升级的数量"""
+        return self._migrate_ids(self._outdated_task_ids()[:batch_size])
+    
+    def _outdated_task_ids(self, tasks: Optional[dict] = None) -> list:
+        if tasks is None:
+            tasks = self._snapshot.tasks
+        if isinstance(tasks, snapshot_format.LazyTasks):
+            return tasks.outdated_ids(migrations.SCHEMA_VERSION)   # 用索引判断，不解码
+        return [task_id for task_id, task in tasks.items() if migrations.needs_migration(task)]
+    
+    def _migrate_ids(self, task_ids: list) -> int:
+        if not task_ids:
+            return 0
+        # 升级在锁外对只读快照进行；事务里只替换记录，整批只写一次文件
+        tasks = self._snapshot.tasks
+        upgraded = {}
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            if task is not None:
+                upgraded[task_id] = (task, migrations.upgrade_task(_copy_json(task)))
+        with self._transaction():
+            draft = self._draft["tasks"]
+            for task_id, (task, new_task) in upgraded.items():
+                if draft.get(task_id) is task:
+                    draft[task_id] = new_task
+                    self._copied.add(task_id)
+                else:
+                    self._mutable_task(task_id)   # 期间被修改或重新加载过：从当前版本升级
+        self._migrated.clear()
+        return len(upgraded)
+    
+    def start_background_migration(self):
+        """后台升级所有旧版本记录，不阻塞启动；升级在锁外完成，最后只写入一次"""
+        if self._migration_thread is not None:
+            return
+        pending = self._outdated_task_ids()
+        if not pending:
+            return
+        
+        def run():
+            try:
+                self._migrate_ids(pending)
+            except Exception as e:
+                print(f"后台数据迁移失败: {e}")
+        
+        self._migration_thread = threading.Thread(target=run, daemon=True)
+        self._migration_thread.start()
     
     # ============ 任务操作 ============
     
     def add_task(self, task_name: str) -> str:
         """添加主任务，返回任务ID"""
-        task_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
-        self.data["tasks"][task_id] = {
-            "name": task_name,
-            "created_at": datetime.now().isoformat(),
-            "subtasks": [],
-            "completed": False
-        }
-        self.save()
+        with self._transaction():
+            task_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+            # 时钟精度不足时（如 Windows）同一微秒内可能重复
+            suffix = 0
+            while task_id in self.data["tasks"]:
+                suffix += 1
+                task_id = f"{task_id.split('_')[0]}_{suffix}"
+            self.data["tasks"][task_id] = {
+                "name": task_name,
+                "created_at": datetime.now().isoformat(),
+                "subtasks": [],
+                "completed": False,
+                "leaf_total": 0,
+                "leaf_done": 0,
+                "schema": migrations.SCHEMA_VERSION
+            }
         return task_id
     
     def add_subtask(self, task_id: str, name: str, minutes: int):
         """添加子任务"""
-        if task_id in self.data["tasks"]:
-            self.data["tasks"][task_id]["subtasks"].append({
-                "name": name,
-                "minutes": minutes,
-                "done": False,
-                "created_at": datetime.now().isoformat()
-            })
-            self.save()
+        self.add_subtasks_batch(task_id, [{"name": name, "minutes": minutes}])
     
     def add_subtasks_batch(self, task_id: str, subtasks: list):
-        """批量添加子任务（用于AI生成的结果）"""
-        if task_id in self.data["tasks"]:
-            for st in subtasks:
-                self.data["tasks"][task_id]["subtasks"].append({
-                    "name": st["name"],
-                    "minutes": st["minutes"],
-                    "done": False,
-                    "created_at": datetime.now().isoformat()
-                })
-            self.save()
-    
-    def toggle_subtask(self, task_id: str, subtask_index: int):
-        """切换子任务完成状态"""
-        subtask = self.data["tasks"][task_id]["subtasks"][subtask_index]
-        subtask["done"] = not subtask["done"]
-        self.save()
+        """批量添加子任务（用于AI生成的结果）
+        
+        subtasks 中的步骤可以带 children（递归分解的结果）
+        """
+        with self._transaction():
+            task = self._mutable_task(task_id)
+            if task is None:
+                return
+            nodes = [
+                task_tree.make_node(st["name"], st["minutes"], st.get("children"))
+                for st in subtasks
+            ]
+            d_total = sum(task_tree.node_counts(node)[0] for node in nodes)
+            stats = self._mutable_stats()
+            for leaf in productivity.iter_leaves(nodes):
+                productivity.record_planned(stats, leaf)
+            task["subtasks"].extend(nodes)
+            task_tree.apply_delta(task, [], d_total, 0)
+    
+    def add_tasks_batch(self, tasks: list) -> list:
+        """批量添加主任务（可带子任务），只保存一次，返回任务ID列表
+        
+        tasks: [{"name": "任务名", "subtasks": [{"name": ..., "minutes": ...}]}]
+        """
+        task_ids = []
+        with self._transaction():
+            for task in tasks:
+                task_id = self.add_task(task["name"])
+                self.add_subtasks_batch(task_id, task.get("subtasks", []))
+                task_ids.append(task_id)
+        return task_ids
+    
+    def set_subtask_done(self, task_id: str, subtask_index, done: bool = True):
+        """设置子任务完成状态（与 toggle 不同，重复调用结果不变）
+        
+        subtask_index 可以是顶层序号或路径（序号列表）
+        """
+        with self._transaction():
+            task = self._mutable_task(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            _, node, ancestors = task_tree.resolve(task, subtask_index)
+            changed = []
+            d_done = task_tree.set_done(node, done, changed)
+            task_tree.apply_delta(task, ancestors, 0, d_done)
+            self._record_completion(task, changed, done)
+    
+    def batch(self):
+        """批量操作：with 块内的所有修改只加锁和保存一次
+        
+        用法:
+            with data_service.batch():
+                for name in names:
+                    data_service.add_task(name)
+        """
+        return self._transaction()
+    
+    def toggle_subtask(self, task_id: str, subtask_index):
+        """切换子任务完成状态（subtask_index 可以是顶层序号或路径）"""
+        with self._transaction():
+            _, node, _ = task_tree.resolve(self.data["tasks"][task_id], subtask_index)
+            self.set_subtask_done(task_id, subtask_index, not node["done"])
     
     def delete_task(self, task_id: str):
         """删除主任务"""
-        if task_id in self.data["tasks"]:
-            del self.data["tasks"][task_id]
-            self.save()
+        with self._transaction():
+            task = self.data["tasks"].get(task_id)
+            if task is not None:
+                # 未完成的步骤从计划中扣掉，已完成的保留在历史里
+                stats = self._mutable_stats()
+                for leaf in productivity.iter_leaves(task.get("subtasks", [])):
+                    if not leaf.get("done"):
+                        productivity.record_planned(stats, leaf, -1)
+                del self.data["tasks"][task_id]
     
-    def delete_subtask(self, task_id: str, subtask_index: int):
-        """删除子任务"""
-        del self.data["tasks"][task_id]["subtasks"][subtask_index]
-        self.save()
+    def delete_subtask(self, task_id: str, subtask_index):
+        """删除子任务（subtask_index 可以是顶层序号或路径）"""
+        with self._transaction():
+            task = self._mutable_task(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            siblings, node, ancestors = task_tree.resolve(task, subtask_index)
+            d_total, d_done = task_tree.node_counts(node)
+            index = subtask_index if isinstance(subtask_index, int) else subtask_index[-1]
+            del siblings[index]
+            stats = self._mutable_stats()
+            for leaf in productivity.iter_leaves([node]):
+                if not leaf.get("done"):
+                    productivity.record_planned(stats, leaf, -1)
+            if ancestors and not siblings:
+                # 最后一个子步骤被删除，父步骤变回普通步骤（贡献 1 个未完成的叶子）
+                parent = ancestors.pop()
+                for key in ("children", "leaf_total", "leaf_done"):
+                    parent.pop(key)
+                parent["done"] = False
+                productivity.record_planned(stats, parent)
+                d_total -= 1
+            task_tree.apply_delta(task, ancestors, -d_total, -d_done)
     
     def get_all_tasks(self) -> dict:
-        """获取所有任务"""
-        return self.data["tasks"]
+        """获取所有任务（当前快照，只读；旧版本记录返回升级后的副本）"""
+        snapshot = self._snapshot
+        if self._tx_owner == threading.get_ident():
+            return self._draft["tasks"]
+        cache = self._all_tasks_cache
+        if cache is not None and cache[0] == snapshot.version:
+            return cache[1]
+        tasks = snapshot.tasks
+        outdated = self._outdated_task_ids(tasks)   # 二进制快照用索引判断，不解码
+        if outdated:
+            tasks = tasks.copy()
+            for tid in outdated:
+                tasks[tid] = self._read_task(tid, tasks[tid])
+        self._all_tasks_cache = (snapshot.version, tasks)
+        return tasks
+    
+    def get_task_summaries(self) -> dict:
+        """任务列表显示用 {任务ID: 任务或摘要}，都有 name、leaf_total、leaf_done（只读）
+        
+        从二进制快照加载时只读索引，不解码任务；否则就是 get_all_tasks()。
+        """
+        tasks = self._snapshot.tasks
+        if self._tx_owner == threading.get_ident() or not isinstance(tasks, snapshot_format.LazyTasks):
+            return self.get_all_tasks()
+        return {
+            tid: task if tasks.peek(tid) is None else self._read_task(tid, task)
+            for tid, task in tasks.summaries().items()
+        }
     
     def get_task(self, task_id: str) -> Optional[dict]:
-        """获取单个任务"""
-        return self.data["tasks"].get(task_id)
+        """获取单个任务（当前快照，只读；旧版本记录返回升级后的副本）"""
+        task = self.data["tasks"].get(task_id)
+        if task is None:
+            return None
+        return self._read_task(task_id, task)
+    
+    def get_stats(self) -> dict:
+        """效率统计 {"daily": {...}, "weekly": {...}}（只读，汇总格式见 productivity）"""
+        data = self.data
+        if "stats" in data:
+            return data["stats"]
+        # 还没有写入过统计：在内存中回填，第一次写入时再保存
+        snapshot = self._snapshot
+        cache = self._stats_cache
+        if cache is None or cache[0] != snapshot.version:
+            cache = (snapshot.version, productivity.backfill(snapshot.tasks))
+            self._stats_cache = cache
+        return cache[1]
     
     # ============ 导入导出 ============
     
@@ -102,8 +517,9 @@ class DataService:
             export_data = {
                 "app": "TaskBreaker",
                 "version": "1.0",
+                "schema_version": migrations.SCHEMA_VERSION,
                 "exported_at": datetime.now().isoformat(),
-                "data": self.data
+                "data": _serializable(self.data)
             }
             with open(export_path, "w", encoding="utf-8") as f:
                 json.dump(export_data, f, ensure_ascii=False, indent=2)
@@ -121,14 +537,18 @@ class DataService:
             # 验证数据格式
             if "data" in import_data and "tasks" in import_data["data"]:
                 # 合并数据（不覆盖现有任务）
-                imported_count = 0
-                for task_id, task in import_data["data"]["tasks"].items():
-                    if task_id not in self.data["tasks"]:
-                        self.data["tasks"][task_id] = task
-                        imported_count += 1
+                imported_ids = []
+                with self._transaction():
+                    for task_id, task in import_data["data"]["tasks"].items():
+                        if task_id not in self.data["tasks"]:
+                            task.pop("leaf_total", None)   # 不信任外部数据的汇总计数
+                            migrations.upgrade_task(task)
+                            task_tree.ensure_rollup(task)
+                            productivity.add_task_history(self._mutable_stats(), task)
+                            self.data["tasks"][task_id] = task
+                            imported_ids.append(task_id)
                 
-                self.save()
-                return {"success": True, "imported": imported_count}
+                return {"success": True, "imported": len(imported_ids), "task_ids": imported_ids}
             else:
                 return {"success": False, "error": "无效的数据格式"}
                 
@@ -140,23 +560,29 @@ class DataService:
         export_data = {
             "app": "TaskBreaker",
             "version": "1.0",
+            "schema_version": migrations.SCHEMA_VERSION,
             "exported_at": datetime.now().isoformat(),
-            "data": self.data
+            "data": _serializable(self.data)
         }
         return json.dumps(export_data, ensure_ascii=False)
     
+    @profiler.timed("data.import")
     def import_from_string(self, data_string: str) -> dict:
         """从字符串导入数据（用于粘贴同步）"""
         try:
             import_data = json.loads(data_string)
             if "data" in import_data and "tasks" in import_data["data"]:
-                imported_count = 0
-                for task_id, task in import_data["data"]["tasks"].items():
-                    if task_id not in self.data["tasks"]:
-                        self.data["tasks"][task_id] = task
-                        imported_count += 1
-                self.save()
-                return {"success": True, "imported": imported_count}
+                imported_ids = []
+                with self._transaction():
+                    for task_id, task in import_data["data"]["tasks"].items():
+                        if task_id not in self.data["tasks"]:
+                            task.pop("leaf_total", None)   # 不信任外部数据的汇总计数
+                            migrations.upgrade_task(task)
+                            task_tree.ensure_rollup(task)
+                            productivity.add_task_history(self._mutable_stats(), task)
+                            self.data["tasks"][task_id] = task
+                            imported_ids.append(task_id)
+                return {"success": True, "imported": len(imported_ids), "task_ids": imported_ids}
             return {"success": False, "error": "无效的数据格式"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -175,4 +601,59 @@ if __name__ == "__main__":
     
     # 测试导出
     export_str = ds.get_export_string()
-    print("导出数据:", export_str)
\ No newline at end of file
+    print("导出数据:", export_str)
+    
+    # 并发压力测试：写线程不断修改，读线程检查拿到的快照始终一致
+    import random
+    import tempfile
+    
+    stress = DataService(os.path.join(tempfile.mkdtemp(), "tasks.json"))
+    errors = []
+    stop = threading.Event()
+    
+    def writer(n: int):
+        for i in range(30):
+            tid = stress.add_task(f"线程{n}-任务{i}")
+            stress.add_subtasks_batch(tid, [{"name": "步骤", "minutes": 5}] * 3)
+            stress.toggle_subtask(tid, random.randrange(3))
+            if i % 10 == 0:
+                stress.delete_task(tid)
+    
+    def reader():
+        last_version = 0
+        while not stop.is_set():
+            snap = stress.snapshot()
+            if snap.version < last_version:
+                errors.append("版本倒退")
+            last_version = snap.version
+            for task in snap.tasks.values():
+                done = sum(1 for st in task["subtasks"] if st["done"])
+                if (task["leaf_total"], task["leaf_done"]) != (len(task["subtasks"]), done):
+                    errors.append(f"快照不一致: {task['name']}")
+            stop.wait(0.001)
+    
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+    
+    print(f"\n压力测试: 版本 {stress.generation}, 任务 {len(stress.get_all_tasks())} "
+          f"(期望 {8 * 27}), 错误 {len(errors)}")
+    
+    # 统计：不改统计的写事务（删除没有步骤的任务）之后，导出、快照和重新加载都不能丢历史
+    stats_file = os.path.join(tempfile.mkdtemp(), "tasks.json")
+    first = DataService(stats_file, binary_snapshot=True)
+    first.add_subtasks_batch(first.add_task("有步骤的任务"), [{"name": "步骤", "minutes": 5}] * 2)
+    history = productivity.plain(first.get_stats())
+    first.delete_task(first.add_task("空任务"))
+    assert json.loads(first.get_export_string())["data"]["stats"] == history
+    for _ in range(2):
+        reloaded = DataService(stats_file, binary_snapshot=True)
+        assert productivity.plain(reloaded.get_stats()) == history, reloaded.get_stats()
+        reloaded.delete_task(reloaded.add_task("空任务"))
+    print("统计检查通过")
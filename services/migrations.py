@@ -0,0 +1,50 @@
+"""
+数据版本迁移 - 每条任务记录带 schema 版本，访问时按需升级
+
+新增迁移步骤：
+    1. SCHEMA_VERSION 加 1
+    2. 用 @task_migration(旧版本) 注册升级函数（原地修改传入的任务副本）
+"""
+
+from services import task_tree
+
+# 当前任务记录的版本（没有 schema 字段的旧记录视为版本 1）
+SCHEMA_VERSION = 2
+
+# 旧版本号 -> 升级到下一版本的函数
+TASK_MIGRATIONS = {}
+
+
+def task_migration(from_version: int):
+    """注册任务记录的迁移函数"""
+    def register(func):
+        TASK_MIGRATIONS[from_version] = func
+        return func
+    return register
+
+
+def record_version(task: dict) -> int:
+    return task.get("schema", 1)
+
+
+def needs_migration(task: dict) -> bool:
+    return record_version(task) < SCHEMA_VERSION
+
+
+def upgrade_task(task: dict) -> dict:
+    """把任务记录原地升级到当前版本，返回同一个对象"""
+    version = record_version(task)
+    while version < SCHEMA_VERSION:
+        TASK_MIGRATIONS[version](task)
+        version += 1
+    task["schema"] = version
+    return task
+
+
+# ============ 迁移步骤 ============
+
+@task_migration(1)
+def _add_rollup_counters(task: dict):
+    """v1 -> v2: 支持子步骤，任务和内部节点保存叶子汇总计数"""
+    task.setdefault("subtasks", [])
+    task["leaf_total"], task["leaf_done"] = task_tree.count_leaves(task["subtasks"])
@@ -0,0 +1,201 @@
+"""
+离线分解引擎 - 不联网，根据内置模板和用户自己完成过的任务生成步骤
+"""
+
+from typing import Optional
+
+from services.task_tree import get_progress
+
+# 内置模板：按顺序匹配关键词，{task} 会替换成任务名
+BUILTIN_TEMPLATES = [
+    {
+        "keywords": ["代码", "开发", "编程", "程序", "bug", "功能", "接口"],
+        "subtasks": [
+            {"name": "打开项目，读一遍{task}的需求", "minutes": 5},
+            {"name": "找到需要修改的代码位置", "minutes": 15},
+            {"name": "写出最简单能运行的版本", "minutes": 30},
+            {"name": "补充测试或手动验证", "minutes": 20},
+            {"name": "整理代码并提交", "minutes": 10},
+        ]
+    },
+    {
+        "keywords": ["学习", "复习", "考试", "背", "课", "看书", "阅读"],
+        "subtasks": [
+            {"name": "准备好{task}需要的书和笔记", "minutes": 5},
+            {"name": "浏览目录，确定今天要学的范围", "minutes": 5},
+            {"name": "学习第一部分内容", "minutes": 25},
+            {"name": "休息一下，回忆刚学的要点", "minutes": 5},
+            {"name": "学习第二部分内容", "minutes": 25},
+            {"name": "做几道练习题检验效果", "minutes": 15},
+        ]
+    },
+    {
+        "keywords": ["论文", "报告", "文章", "作文", "文档", "写"],
+        "subtasks": [
+            {"name": "打开文档，写下{task}的标题", "minutes": 5},
+            {"name": "列出要写的3-5个要点", "minutes": 10},
+            {"name": "收集每个要点需要的资料", "minutes": 25},
+            {"name": "写出第一个要点的初稿（不求完美）", "minutes": 25},
+            {"name": "写完剩下要点的初稿", "minutes": 30},
+            {"name": "通读一遍并修改", "minutes": 20},
+        ]
+    },
+    {
+        "keywords": ["ppt", "演示", "汇报", "演讲", "答辩"],
+        "subtasks": [
+            {"name": "新建文件，写下{task}的主题", "minutes": 5},
+            {"name": "列出每页的标题（大纲）", "minutes": 15},
+            {"name": "填充每页的核心内容", "minutes": 30},
+            {"name": "调整排版和配图", "minutes": 20},
+            {"name": "完整演练一遍", "minutes": 15},
+        ]
+    },
+    {
+        "keywords": ["打扫", "整理", "收拾", "清理", "洗"],
+        "subtasks": [
+            {"name": "先花2分钟把最显眼的东西归位", "minutes": 2},
+            {"name": "准备好{task}需要的工具", "minutes": 5},
+            {"name": "处理第一个区域", "minutes": 15},
+            {"name": "处理剩下的区域", "minutes": 20},
+            {"name": "丢掉垃圾，检查一遍", "minutes": 5},
+        ]
+    },
+    {
+        "keywords": ["运动", "健身", "跑步", "锻炼", "瑜伽"],
+        "subtasks": [
+            {"name": "换上运动服", "minutes": 3},
+            {"name": "热身", "minutes": 5},
+            {"name": "{task}主体训练", "minutes": 25},
+            {"name": "拉伸放松", "minutes": 5},
+        ]
+    },
+    {
+        "keywords": ["邮件", "回复", "联系", "电话", "沟通"],
+        "subtasks": [
+            {"name": "写下{task}想达成的目的", "minutes": 3},
+            {"name": "列出需要说明的要点", "minutes": 5},
+            {"name": "写草稿或准备话术", "minutes": 10},
+            {"name": "发送或拨打", "minutes": 5},
+        ]
+    },
+]
+
+# 没有任何模板匹配时的通用步骤
+GENERIC_TEMPLATE = [
+    {"name": "花2分钟想清楚{task}做完是什么样子", "minutes": 2},
+    {"name": "准备好需要的材料和工具", "minutes": 5},
+    {"name": "完成最简单的第一小步", "minutes": 10},
+    {"name": "专注推进主要部分", "minutes": 25},
+    {"name": "继续完成剩余部分", "minutes": 25},
+    {"name": "检查结果并收尾", "minutes": 10},
+]
+
+
+def _bigrams(text: str) -> set:
+    """字符二元组（适合中文，不需要分词）"""
+    text = "".join(ch for ch in text.lower() if ch.isalnum())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class OfflineBreakdownEngine:
+    def __init__(self, data_service=None, min_similarity: float = 0.3):
+        self.data_service = data_service
+        self.min_similarity = min_similarity
+        self._mined = []          # [(二元组集合, 任务ID)]，子任务在匹配到时才读取
+        self._index = {}          # 二元组 -> 模板序号列表
+        self._index_generation = None
+
+    def _refresh_index(self):
+        """从已完成的任务中提取模板（数据没变化时不重建）
+
+        只用任务名和进度（二进制快照中直接读索引，不解码任务）
+        """
+        if self.data_service is None:
+            return
+        generation = self.data_service.generation
+        if generation == self._index_generation:
+            return
+
+        mined, index = [], {}
+        for task_id, task in self.data_service.get_task_summaries().items():
+            done, total = get_progress(task)
+            if total == 0 or done < total:
+                continue
+            grams = _bigrams(task["name"])
+            if not grams:
+                continue
+            for gram in grams:
+                index.setdefault(gram, []).append(len(mined))
+            mined.append((grams, task_id))
+
+        self._mined, self._index = mined, index
+        self._index_generation = generation
+
+    def _match_mined(self, grams: set) -> Optional[list]:
+        """找最相似的已完成任务（只比较有共同二元组的候选）"""
+        candidates = {}
+        for gram in grams:
+            for i in self._index.get(gram, ()):
+                candidates[i] = candidates.get(i, 0) + 1
+
+        best, best_score = None, self.min_similarity
+        for i, common in candidates.items():
+            other = self._mined[i][0]
+            score = common / (len(grams) + len(other) - common)
+            if score >= best_score:
+                best, best_score = i, score
+        if best is None:
+            return None
+        task = self.data_service.get_task(self._mined[best][1])
+        if task is None:
+            return None
+        return [{"name": st["name"], "minutes": st["minutes"]} for st in task["subtasks"]]
+
+    @staticmethod
+    def _match_builtin(task: str) -> Optional[list]:
+        lowered = task.lower()
+        for template in BUILTIN_TEMPLATES:
+            if any(keyword in lowered for keyword in template["keywords"]):
+                return template["subtasks"]
+        return None
+
+    def break_down(self, task: str) -> dict:
+        """离线分解，返回格式与 AIService.break_down_task 相同"""
+        self._refresh_index()
+
+        subtasks = self._match_mined(_bigrams(task))
+        template = "history"
+        if subtasks is None:
+            subtasks = self._match_builtin(task)
+            template = "builtin"
+        if subtasks is None:
+            subtasks = GENERIC_TEMPLATE
+            template = "generic"
+
+        return {
+            "success": True,
+            "data": {
+                "subtasks": [
+                    {"name": st["name"].replace("{task}", task), "minutes": st["minutes"]}
+                    for st in subtasks
+                ]
+            },
+            "source": "offline",
+            "template": template
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    import time
+
+    engine = OfflineBreakdownEngine()
+    for name in ["完成毕业论文第三章", "复习高数期末考试", "修复登录页面bug", "去银行办卡"]:
+        start = time.perf_counter()
+        result = engine.break_down(name)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{name} ({result['template']}, {elapsed:.2f}ms):")
+        for st in result["data"]["subtasks"]:
+            print(f"  - {st['name']} ({st['minutes']}min)")
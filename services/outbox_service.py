@@ -0,0 +1,184 @@
+"""
+离线队列 - 网络不可用时保存AI分解请求，恢复后在后台自动发送
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from services.ai_service import AIService, PROMPT_VERSION
+from services.data_service import DataService
+
+
+class OutboxService:
+    def __init__(self, ai_service: AIService, data_service: DataService,
+                 queue_file: str = None):
+        self.ai_service = ai_service
+        self.data_service = data_service
+        self.retry_policy = ai_service.retry_policy
+        self.queue_file = queue_file or os.path.join(
+            os.path.dirname(data_service.data_file), "outbox.json"
+        )
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.entries = self._load()
+
+    def _load(self) -> list:
+        """从文件加载队列"""
+        if os.path.exists(self.queue_file):
+            try:
+                with open(self.queue_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"加载离线队列失败: {e}")
+        return []
+
+    def _save(self):
+        """保存队列（调用方需持有 self._lock）"""
+        tmp_file = self.queue_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.queue_file)
+
+    def enqueue(self, task_id: str, task_name: str, recursive: bool = False,
+                split_minutes: int = 45) -> bool:
+        """加入队列（同一任务只保留一个请求），返回是否新加入
+
+        split_minutes 是递归分解时继续拆分的阈值（记录入队时的设置）
+        入队是因为刚刚请求失败，所以第一次发送也等一个退避间隔
+        """
+        with self._lock:
+            if any(entry["task_id"] == task_id for entry in self.entries):
+                return False
+            self.entries.append({
+                "id": uuid.uuid4().hex,
+                "task_id": task_id,
+                "task_name": task_name,
+                "recursive": recursive,
+                "split_minutes": split_minutes,
+                "prompt_version": PROMPT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "attempts": 0,
+                "next_attempt_at": time.time() + self.retry_policy.delay(1)
+            })
+            self._save()
+        self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        """队列中等待发送的请求数"""
+        with self._lock:
+            return len(self.entries)
+
+    def _remove(self, entry_id: str):
+        with self._lock:
+            self.entries = [e for e in self.entries if e["id"] != entry_id]
+            self._save()
+
+    def discard(self, task_id: str) -> bool:
+        """任务已经用其他方式分解（如网络恢复后手动分解成功）时撤销它的请求"""
+        with self._lock:
+            entries = [e for e in self.entries if e["task_id"] != task_id]
+            if len(entries) == len(self.entries):
+                return False
+            self.entries = entries
+            self._save()
+        return True
+
+    def _still_needed(self, entry: dict) -> bool:
+        """任务还在、没改名，也还没有步骤"""
+        task = self.data_service.get_task(entry["task_id"])
+        return task is not None and task["name"] == entry["task_name"] and not task["subtasks"]
+
+    def drain_once(self) -> int:
+        """发送所有到期的请求，返回成功应用的数量
+
+        网络仍不可用时本轮停止，等待退避时间后再试。
+        """
+        now = time.time()
+        with self._lock:
+            due = [dict(e) for e in self.entries if e["next_attempt_at"] <= now]
+
+        applied = 0
+        for entry in due:
+            if not self._still_needed(entry):
+                # 任务已删除、改名或已经有了步骤，请求作废
+                self._remove(entry["id"])
+                continue
+
+            if entry["recursive"]:
+                result = self.ai_service.break_down_recursive(
+                    entry["task_name"], entry.get("split_minutes", 45), allow_offline=False
+                )
+            else:
+                result = self.ai_service.break_down_task(entry["task_name"], allow_offline=False)
+
+            if result["success"]:
+                # 请求期间用户可能已经手动分解过
+                if self._still_needed(entry):
+                    self.data_service.add_subtasks_batch(entry["task_id"], result["data"]["subtasks"])
+                    applied += 1
+                self._remove(entry["id"])
+                continue
+
+            attempts = entry["attempts"] + 1
+            # 网络不通时一直等待恢复；服务商返回的错误按重试策略限制次数
+            keep = result.get("unreachable") or (
+                result.get("retryable") and self.retry_policy.should_retry(attempts)
+            )
+            if not keep:
+                print(f"离线队列请求失败，已放弃: {entry['task_name']} {result['error']}")
+                self._remove(entry["id"])
+                continue
+
+            next_at = time.time() + self.retry_policy.delay(attempts)
+            with self._lock:
+                for e in self.entries:
+                    if e["id"] == entry["id"]:
+                        e["attempts"] = attempts
+                        e["next_attempt_at"] = next_at
+                    elif result.get("unreachable") and e["next_attempt_at"] <= now:
+                        # 网络不通，本轮其余请求一起推迟
+                        e["next_attempt_at"] = next_at
+                self._save()
+            if result.get("unreachable"):
+                break
+        return applied
+
+    def _next_wait(self) -> float:
+        with self._lock:
+            if not self.entries:
+                return 60.0
+            next_at = min(e["next_attempt_at"] for e in self.entries)
+        return max(0.0, min(60.0, next_at - time.time()))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self._next_wait())
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if not self.ai_service.is_available():
+                # 未配置API时不发送，过一会再检查
+                self._stopped.wait(30)
+                continue
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"处理离线队列失败: {e}")
+
+    def start(self):
+        """启动后台发送线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台发送线程"""
+        self._stopped.set()
+        self._wakeup.set()
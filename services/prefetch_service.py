@@ -0,0 +1,88 @@
+"""
+预取服务 - 任务创建后在后台提前进行AI分解，点击"AI分解"时直接使用结果
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from services.ai_service import AIService
+
+
+class PrefetchService:
+    def __init__(self, ai_service: AIService, max_in_flight: int = 2, max_buffered: int = 20):
+        self.ai_service = ai_service
+        self.max_in_flight = max_in_flight    # 同时进行的预取请求上限（控制费用）
+        self.max_buffered = max_buffered      # 最多保留多少个还没被使用的结果
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()   # task_id -> ((任务名, 是否递归), Future)
+
+    def _in_flight(self) -> int:
+        return sum(1 for _, future in self._pending.values() if not future.done())
+
+    def speculate(self, task_id: str, task_name: str, recursive: bool = False,
+                  split_minutes: int = 45) -> bool:
+        """开始预取，超过并发上限时放弃，返回是否已提交"""
+        if not self.ai_service.is_available():
+            return False
+
+        with self._lock:
+            if task_id in self._pending or self._in_flight() >= self.max_in_flight:
+                return False
+            if recursive:
+                future = self._executor.submit(
+                    self.ai_service.break_down_recursive, task_name, split_minutes,
+                    allow_offline=False
+                )
+            else:
+                future = self._executor.submit(
+                    self.ai_service.break_down_task, task_name, allow_offline=False
+                )
+            self._pending[task_id] = ((task_name, recursive), future)
+
+            # 丢弃最早的、已经完成但一直没用上的结果
+            while len(self._pending) > self.max_buffered:
+                oldest_id = next(iter(self._pending))
+                self._pending.pop(oldest_id)[1].cancel()
+        return True
+
+    def cancel(self, task_id: str):
+        """任务被删除或改名时取消（已经在执行的请求结果会被丢弃）"""
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+        if entry:
+            entry[1].cancel()
+
+    def take(self, task_id: str, task_name: str, recursive: bool = False,
+             timeout: Optional[float] = None) -> Optional[dict]:
+        """取出预取结果
+
+        请求还在进行中时等待它完成（比重新发一次更快）；
+        没有预取、任务名或分解方式已变化、预取失败时返回 None。
+        """
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return None
+
+        key, future = entry
+        if key != (task_name, recursive):
+            future.cancel()
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except Exception:
+            return None
+        return result if result["success"] else None
+
+    def shutdown(self):
+        """关闭线程池（不等待进行中的请求）"""
+        with self._lock:
+            for _, future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._executor.shutdown(wait=False)
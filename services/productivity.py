@@ -0,0 +1,201 @@
+"""
+效率统计 - 按天和按周预先汇总的计划/完成时间
+
+保存在数据文件的 "stats" 中:
+    {"daily": {"2025-06-01": 汇总}, "weekly": {"2025-W22": 汇总}}
+
+每个汇总:
+    planned_minutes / planned_steps   当天新建的步骤（未完成就删除的步骤会扣掉）
+    done_minutes / done_steps         当天完成的步骤
+    timed_estimate_minutes            能算出实际用时的步骤的预估时间之和
+    timed_actual_minutes              这些步骤的实际用时之和
+
+实际用时按同一任务里相邻两次完成的间隔估算（同一天内、不超过 MAX_TIMED_GAP_MINUTES），
+所以只有连续做的步骤才计入预估准确度。
+修改都是对单个汇总的加减（O(1)），汇总字典整体替换，不影响已发布的快照。
+写事务中每个范围是一个 Buckets：共享的历史汇总加上少量改过的汇总，复制的代价与历史长度无关。
+"""
+
+from datetime import datetime
+from typing import Iterator, Optional
+
+# 改过的汇总超过这个数量时才合并成新的历史字典（通常只有今天和本周在变）
+MAX_DELTA_BUCKETS = 64
+
+FIELDS = ("planned_minutes", "planned_steps", "done_minutes", "done_steps",
+          "timed_estimate_minutes", "timed_actual_minutes")
+
+# 两次完成间隔超过这个时间就不算作连续工作；太短则是顺手一起勾选的
+MAX_TIMED_GAP_MINUTES = 180
+MIN_TIMED_GAP_MINUTES = 0.5
+
+
+class Buckets(dict):
+    """一个范围（daily/weekly）的汇总：base 是共享且不再修改的字典，本身只保存改过的汇总
+
+    读取时先查改过的汇总再查 base，对外表现和普通字典一样。
+    重写 __iter__ 是为了让 dict(x) / {**x} 走 keys() + __getitem__，合并 base 中的内容。
+    注意 json 的 C 编码器遇到自身存储为空的字典子类会直接输出 {}，序列化前要先用 plain() 转换。
+    """
+    __slots__ = ("base",)
+
+    def __init__(self, base: Optional[dict] = None, delta=()):
+        super().__init__(delta)
+        self.base = base if base is not None else {}
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base[key]
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base.get(key, default)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.base
+
+    def keys(self):
+        return list(dict.fromkeys([*self.base, *dict.keys(self)]))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __eq__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, Buckets) else other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def derive(self) -> "Buckets":
+        """写事务用的副本：只复制改过的汇总，太多时合并成新的 base"""
+        delta = dict.items(self)
+        if dict.__len__(self) >= MAX_DELTA_BUCKETS:
+            return Buckets({**self.base, **dict(delta)})
+        return Buckets(self.base, delta)
+
+
+def derive(buckets: dict) -> Buckets:
+    """已发布快照中的汇总 -> 写事务中可以修改的副本（不修改原来的字典）"""
+    if isinstance(buckets, Buckets):
+        return buckets.derive()
+    return Buckets(buckets)
+
+
+def plain(stats: dict) -> dict:
+    """转换成普通字典（写文件、导出前使用，见 Buckets）"""
+    return {scope: dict(buckets.items()) for scope, buckets in stats.items()}
+
+
+def new_stats() -> dict:
+    return {"daily": {}, "weekly": {}}
+
+
+def period_keys(timestamp: str) -> tuple:
+    """ISO 时间 -> (日期, ISO 周)"""
+    moment = datetime.fromisoformat(timestamp)
+    year, week, _ = moment.isocalendar()
+    return moment.strftime("%Y-%m-%d"), f"{year}-W{week:02d}"
+
+
+def add(stats: dict, timestamp: str, **delta):
+    """把 delta 加到 timestamp 所在的天和周"""
+    for scope, key in zip(("daily", "weekly"), period_keys(timestamp)):
+        bucket = dict(stats[scope].get(key) or dict.fromkeys(FIELDS, 0))
+        for field, value in delta.items():
+            bucket[field] = round(bucket[field] + value, 2)
+        stats[scope][key] = bucket
+
+
+def iter_leaves(nodes: list) -> Iterator[dict]:
+    for node in nodes:
+        if node.get("children"):
+            yield from iter_leaves(node["children"])
+        else:
+            yield node
+
+
+def record_planned(stats: dict, leaf: dict, sign: int = 1):
+    """步骤加入（sign=1）或撤销（sign=-1）计划"""
+    if leaf.get("created_at"):
+        add(stats, leaf["created_at"],
+            planned_minutes=sign * leaf.get("minutes", 0), planned_steps=sign)
+
+
+def record_done(stats: dict, leaf: dict, sign: int = 1):
+    """已完成的步骤计入（sign=1）或撤销（sign=-1）完成统计
+
+    没有完成时间的旧步骤按创建时间计入
+    """
+    timestamp = leaf.get("done_at") or leaf.get("created_at")
+    if not timestamp:
+        return
+    delta = {"done_minutes": sign * leaf.get("minutes", 0), "done_steps": sign}
+    if "actual_minutes" in leaf:
+        delta["timed_estimate_minutes"] = sign * leaf.get("minutes", 0)
+        delta["timed_actual_minutes"] = sign * leaf["actual_minutes"]
+    add(stats, timestamp, **delta)
+
+
+def timed_gap(last_done_at: Optional[str], now: datetime) -> Optional[float]:
+    """距离同一任务上次完成的分钟数（不算连续工作时返回 None）"""
+    if not last_done_at:
+        return None
+    last = datetime.fromisoformat(last_done_at)
+    gap = (now - last).total_seconds() / 60
+    if last.date() != now.date() or not MIN_TIMED_GAP_MINUTES <= gap <= MAX_TIMED_GAP_MINUTES:
+        return None
+    return round(gap, 1)
+
+
+def add_task_history(stats: dict, task: dict):
+    """把一个已有任务的全部步骤计入统计（回填和导入时使用）"""
+    for leaf in iter_leaves(task.get("subtasks", [])):
+        record_planned(stats, leaf)
+        if leaf.get("done"):
+            record_done(stats, leaf)
+
+
+def backfill(tasks: dict) -> dict:
+    """从现有任务一次性生成统计"""
+    stats = new_stats()
+    for task in tasks.values():
+        add_task_history(stats, task)
+    return stats
+
+
+def summarize(stats: dict, scope: str = "daily", keys: Optional[list] = None) -> list:
+    """汇总列表（按时间排序），附带完成率和预估准确度
+
+    completion_rate   done_minutes / planned_minutes
+    estimate_accuracy timed_estimate_minutes / timed_actual_minutes（1 表示估得准，小于 1 表示低估）
+    """
+    buckets = stats.get(scope, {})
+    rows = []
+    for key in (keys if keys is not None else sorted(buckets)):
+        bucket = buckets.get(key) or dict.fromkeys(FIELDS, 0)
+        row = dict(bucket, period=key)
+        row["completion_rate"] = (
+            bucket["done_minutes"] / bucket["planned_minutes"] if bucket["planned_minutes"] > 0 else None
+        )
+        row["estimate_accuracy"] = (
+            bucket["timed_estimate_minutes"] / bucket["timed_actual_minutes"]
+            if bucket["timed_actual_minutes"] > 0 else None
+        )
+        rows.append(row)
+    return rows
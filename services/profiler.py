@@ -0,0 +1,201 @@
+"""
+性能分析 - 轻量的计时区间（span），关闭时几乎没有开销
+
+用法:
+    from services.profiler import profiler
+
+    with profiler.span("data.save"):
+        ...
+
+    @profiler.timed("ai.break_down")
+    def break_down_task(...):
+        ...
+
+最外层的区间算作一次"操作"，记录它和其中各个子区间的耗时。
+设置环境变量 DOITNOW_PROFILE=1 启动时即开启，并把每次操作输出到控制台。
+"""
+
+import cProfile
+import functools
+import heapq
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class _NullSpan:
+    """关闭时使用的空区间（共享同一个实例）"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start", "cprofile")
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.cprofile = None
+
+    def __enter__(self):
+        stack = self.profiler._local_stack()
+        if not stack and self.profiler.cprofile_running:
+            self.cprofile = self.profiler._start_capture()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.profiler._finish(self, elapsed_ms)
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, keep_recent: int = 200, keep_slowest: int = 20):
+        self.enabled = enabled
+        self.keep_slowest = keep_slowest
+        self.recent = deque(maxlen=keep_recent)   # 最近的操作记录
+        self._slowest = []                         # 最小堆：(耗时, 序号, 记录)
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._captures = None                      # cProfile 采样中时为 Profile 列表
+        self.sinks = []                            # 每次操作结束时调用 sink(record)
+
+    def _local_stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._local.breakdown = {}
+        return stack
+
+    def span(self, name: str):
+        """计时区间（上下文管理器）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str):
+        """计时装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span: _Span, elapsed_ms: float):
+        stack = self._local_stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        breakdown = self._local.breakdown
+        if stack:
+            # 子区间：累加到本次操作的分解里
+            breakdown[span.name] = breakdown.get(span.name, 0.0) + elapsed_ms
+            return
+
+        record = {
+            "name": span.name,
+            "total_ms": round(elapsed_ms, 3),
+            "breakdown_ms": {k: round(v, 3) for k, v in breakdown.items()},
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._local.breakdown = {}
+        with self._lock:
+            self.recent.append(record)
+            self._counter += 1
+            item = (elapsed_ms, self._counter, record)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, item)
+            elif elapsed_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+        for sink in self.sinks:
+            sink(record)
+
+    def slowest(self) -> list:
+        """最慢的操作（从慢到快）"""
+        with self._lock:
+            return [r for _, _, r in sorted(self._slowest, key=lambda x: -x[0])]
+
+    def get_recent(self, n: int = 20) -> list:
+        with self._lock:
+            return list(self.recent)[-n:]
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self._slowest = []
+
+    # ============ cProfile ============
+    # 界面事件在不同线程里处理，所以采样期间每个最外层区间在自己的线程上开一个
+    # Profile，停止时合并
+
+    @property
+    def cprofile_running(self) -> bool:
+        return self._captures is not None
+
+    def _start_capture(self):
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:   # 其他线程的采样正在进行（Python 3.12+ 同时只能有一个）
+            return None
+        with self._lock:
+            if self._captures is None:
+                prof.disable()
+                return None
+            self._captures.append(prof)
+        return prof
+
+    def start_cprofile(self):
+        """开始 cProfile 采样（需要同时开启计时，只采样最外层区间内的代码）"""
+        with self._lock:
+            if self._captures is None:
+                self._captures = []
+
+    def stop_cprofile(self, output_file: str = None, top: int = 30) -> str:
+        """停止采样，可选保存 .prof 文件，返回按累计耗时排序的前 top 行"""
+        with self._lock:
+            captures, self._captures = self._captures, None
+        if not captures:
+            return ""
+        stats = pstats.Stats(captures[0], stream=io.StringIO())
+        for prof in captures[1:]:
+            stats.add(prof)
+        if output_file:
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+            stats.dump_stats(output_file)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(top)
+        return out.getvalue()
+
+
+def print_sink(record: dict):
+    """把每次操作输出到控制台"""
+    parts = ", ".join(f"{k} {v:.1f}ms" for k, v in
+                      sorted(record["breakdown_ms"].items(), key=lambda x: -x[1]))
+    print(f"[perf] {record['name']} {record['total_ms']:.1f}ms" + (f" ({parts})" if parts else ""))
+
+
+profiler = Profiler(enabled=os.environ.get("DOITNOW_PROFILE") == "1")
+if profiler.enabled:
+    profiler.sinks.append(print_sink)
@@ -0,0 +1,390 @@
+"""
+日程安排 - 把所有未完成的步骤排进工作时间段
+
+规则:
+    - 同一任务的步骤按顺序安排（前一步结束后才能开始下一步）
+    - 先创建的任务优先；排在最前面的步骤放不进当前时间段的剩余时间时，
+      改放能放进去的最长步骤（最佳适配），都放不下再去下一个时间段
+    - 比最长的时间段还长的步骤拆成几段
+
+每个任务只有当前待排的一步在候选中：按优先级放在堆里，按时长放在有序列表里（二分查找），
+所以几千个步骤也只需要几毫秒。
+
+数据变化时增量重排：变化的任务最早出现的位置之前的安排保持不变，只重排之后的部分。
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Optional
+
+from services.data_service import DataService
+from services.task_tree import iter_nodes
+
+# 默认工作时间：周一到周五 9:00-12:00、14:00-18:00（weekday 0 为周一）
+DEFAULT_WORK_WINDOWS = [
+    {"days": [0, 1, 2, 3, 4], "start": "09:00", "end": "12:00"},
+    {"days": [0, 1, 2, 3, 4], "start": "14:00", "end": "18:00"},
+]
+
+
+def _parse_clock(text: str) -> timedelta:
+    hours, minutes = text.strip().split(":")
+    return timedelta(hours=int(hours), minutes=int(minutes))
+
+
+def parse_windows(text: str) -> list:
+    """解析工作时间，如 "1-5 09:00-12:00 14:00-18:00; 6 10:00-12:00"（1 为周一）"""
+    windows = []
+    for part in text.replace("；", ";").split(";"):
+        fields = part.split()
+        if not fields:
+            continue
+        first, _, last = fields[0].partition("-")
+        days = list(range(int(first) - 1, int(last or first)))
+        if not days or days[0] < 0 or days[-1] > 6:
+            raise ValueError(f"星期应为 1-7: {fields[0]}")
+        for span in fields[1:]:
+            start, end = span.split("-")
+            if _parse_clock(end) <= _parse_clock(start):
+                raise ValueError(f"结束时间应晚于开始时间: {span}")
+            windows.append({"days": days, "start": start.strip(), "end": end.strip()})
+    return windows
+
+
+def format_windows(windows: list) -> str:
+    """parse_windows 的反向操作"""
+    groups = {}
+    for window in windows:
+        days = window["days"]
+        key = f"{days[0] + 1}-{days[-1] + 1}" if len(days) > 1 else f"{days[0] + 1}"
+        groups.setdefault(key, []).append(f"{window['start']}-{window['end']}")
+    return "; ".join(f"{key} {' '.join(spans)}" for key, spans in groups.items())
+
+
+def expand_windows(windows: list, start: datetime, days: int) -> list:
+    """start 之后 days 天内的空闲时间段 [(开始, 结束)]，按时间排序"""
+    intervals = []
+    day0 = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(days + 1):
+        day = day0 + timedelta(days=offset)
+        for window in windows:
+            if day.weekday() not in window["days"]:
+                continue
+            begin = max(day + _parse_clock(window["start"]), start)
+            end = day + _parse_clock(window["end"])
+            if end > begin:
+                intervals.append((begin, end))
+    intervals.sort()
+    # 合并重叠的时间段
+    merged = []
+    for begin, end in intervals:
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    return merged
+
+
+def open_steps(task: dict) -> list:
+    """任务中未完成的叶子步骤（按执行顺序）: [(路径, 节点)]"""
+    return [
+        (path, node) for path, node in iter_nodes(task.get("subtasks", []))
+        if not node.get("children") and not node.get("done")
+    ]
+
+
+def pack(chains: dict, free: list, start: Optional[dict] = None,
+         head_remaining: Optional[dict] = None) -> tuple:
+    """把各任务的步骤链排进空闲时间段
+
+    chains: {任务ID: [步骤, ...]}，按优先级从高到低的顺序；
+            步骤为 {"task_id", "path", "name", "task_name", "minutes"}（不会被修改）
+    start: {任务ID: 从第几步开始}；head_remaining: {任务ID: 第一步还剩多少分钟}
+    返回 (安排列表, 没排上的步骤, 第一个没排满的时间点)
+    """
+    rank = {task_id: i for i, task_id in enumerate(chains)}
+    position = {task_id: (start or {}).get(task_id, 0) for task_id in chains}
+    left = dict(head_remaining or {})   # 只有当前步骤可能已经排了一部分
+
+    def remaining(task_id):
+        return left.get(task_id, chains[task_id][position[task_id]]["minutes"])
+
+    heap = [(rank[task_id], task_id) for task_id in chains
+            if position[task_id] < len(chains[task_id])]
+    heapq.heapify(heap)
+    # 各任务当前待排步骤的 (剩余分钟, 优先级, 任务ID)，按时长排序
+    sizes = sorted((remaining(task_id), rank[task_id], task_id) for _, task_id in heap)
+    longest_window = max(((end - begin).total_seconds() / 60 for begin, end in free), default=0)
+
+    slots = []
+    first_gap = None
+    for begin, end in free:
+        cursor = begin
+        while heap:
+            gap = (end - cursor).total_seconds() / 60
+            if gap <= 0:
+                break
+            task_id = heap[0][1]
+            if remaining(task_id) > gap:
+                # 放不下优先级最高的步骤时，找能放进去的最长步骤
+                i = bisect_right(sizes, (gap, len(rank), ""))
+                if i:
+                    task_id = sizes[i - 1][2]
+                elif remaining(task_id) > longest_window and cursor == begin:
+                    pass   # 比任何时间段都长，拆开安排
+                else:
+                    break
+            step = chains[task_id][position[task_id]]
+            step_left = remaining(task_id)
+            minutes = min(step_left, gap)
+            slot_end = cursor + timedelta(minutes=minutes)
+            slots.append({
+                "task_id": task_id,
+                "task_name": step["task_name"],
+                "path": step["path"],
+                "name": step["name"],
+                "minutes": round(minutes, 1),
+                "start": cursor,
+                "end": slot_end,
+                "part": minutes < step["minutes"],
+            })
+            cursor = slot_end
+
+            # 更新候选：移除这一步，加入该任务的下一步
+            del sizes[bisect_left(sizes, (step_left, rank[task_id], task_id))]
+            if step_left - minutes > 0:
+                left[task_id] = step_left - minutes
+            else:
+                left.pop(task_id, None)
+                position[task_id] += 1
+            if position[task_id] < len(chains[task_id]):
+                insort(sizes, (remaining(task_id), rank[task_id], task_id))
+            while heap and position[heap[0][1]] >= len(chains[heap[0][1]]):
+                heapq.heappop(heap)
+        if cursor < end and first_gap is None:
+            first_gap = cursor
+
+    unscheduled = [
+        step for task_id, steps in chains.items() for step in steps[position[task_id]:]
+    ]
+    return slots, unscheduled, first_gap
+
+
+class ScheduleService:
+    def __init__(self, data_service: DataService, settings_service=None, horizon_days: int = 7):
+        self.data_service = data_service
+        self.settings_service = settings_service
+        self.horizon_days = horizon_days
+        self._lock = threading.Lock()
+        self._plan = None
+        self._chains = {}     # 任务ID -> (任务记录, 步骤链)，任务没变时直接复用
+        self.listeners = []   # 计划更新后调用 listener(plan)
+        self.data_service.add_listener(self._on_data_changed)
+
+    def close(self):
+        self.data_service.remove_listener(self._on_data_changed)
+
+    def get_windows(self) -> list:
+        if self.settings_service is not None:
+            return self.settings_service.settings.get("work_windows") or DEFAULT_WORK_WINDOWS
+        return DEFAULT_WORK_WINDOWS
+
+    def get_plan(self, now: Optional[datetime] = None) -> dict:
+        """当前计划（需要时才计算）
+
+        {"slots": [{"task_id", "task_name", "path", "name", "minutes", "start", "end", "part"}],
+         "unscheduled": [{"task_id", "task_name", "path", "name", "minutes"}],
+         "generated_at": datetime}
+        """
+        now = now or datetime.now()
+        with self._lock:
+            plan = self._plan
+            if plan is None or plan["generated_at"].date() != now.date():
+                plan = self._plan = self._build(now)
+            return plan
+
+    def replan(self, now: Optional[datetime] = None) -> dict:
+        """从头重新安排（工作时间修改后调用）"""
+        with self._lock:
+            self._plan = self._build(now or datetime.now())
+            plan = self._plan
+        self._emit(plan)
+        return plan
+
+    def _on_data_changed(self, changed_task_ids):
+        with self._lock:
+            if self._plan is None:
+                return
+            if changed_task_ids is None:
+                self._plan = self._build(datetime.now())
+            else:
+                self._plan = self._rebuild_after_change(changed_task_ids, datetime.now())
+            plan = self._plan
+        self._emit(plan)
+
+    def _emit(self, plan: dict):
+        for listener in list(self.listeners):
+            try:
+                listener(plan)
+            except Exception as e:
+                print(f"计划更新回调失败: {e}")
+
+    def _rebuild_after_change(self, changed: set, now: datetime) -> dict:
+        """保留变化的任务最早出现之前的安排，重排之后的部分"""
+        old = self._plan
+        cut = None
+        for slot in old["slots"]:
+            if slot["task_id"] in changed:
+                cut = slot["start"]
+                break
+        if any(step["task_id"] in changed for step in old["unscheduled"]) or \
+                not any(slot["task_id"] in changed for slot in old["slots"]):
+            # 新任务或之前没排上的任务：可能放进第一个没排满的地方
+            if old["first_gap"] is not None:
+                cut = old["first_gap"] if cut is None else min(cut, old["first_gap"])
+        if cut is None:
+            return self._build(now)
+        cut = max(cut, now)
+        # 已经过了开始时间的步骤要重新安排，同一任务后面的安排也不能保留（否则顺序错乱、步骤重复），
+        # 从这些任务在 now 之后的第一段开始重排
+        overdue = {slot["task_id"] for slot in old["slots"] if slot["start"] < now}
+        for slot in old["slots"]:
+            if slot["task_id"] in overdue and now <= slot["start"] < cut:
+                cut = slot["start"]
+                break
+        kept = [
+            slot for slot in old["slots"]
+            if slot["task_id"] not in overdue and slot["start"] >= now and slot["end"] <= cut
+        ]
+        return self._build(now, kept, cut, old["first_gap"] if old["first_gap"] and old["first_gap"] < cut else None)
+
+    def _build(self, now: datetime, kept: Optional[list] = None,
+               start: Optional[datetime] = None, first_gap: Optional[datetime] = None) -> dict:
+        kept = kept or []
+        start = start or now
+        placed, placed_steps = {}, {}
+        for slot in kept:
+            key = (slot["task_id"], tuple(slot["path"]))
+            placed[key] = placed.get(key, 0) + slot["minutes"]
+            placed_steps.setdefault(slot["task_id"], set()).add(key[1])
+
+        chains, cache = {}, {}
+        positions, head_remaining = {}, {}
+        for task_id, task in self.data_service.get_all_tasks().items():
+            cached = self._chains.get(task_id)
+            if cached is None or cached[0] is not task:
+                cached = (task, [
+                    {"task_id": task_id, "task_name": task["name"], "path": path,
+                     "name": node["name"], "minutes": node.get("minutes", 0) or 0}
+                    for path, node in open_steps(task)
+                ])
+            cache[task_id] = cached
+            steps = cached[1]
+            if not steps:
+                continue
+            chains[task_id] = steps
+            # 保留的安排覆盖的是每个任务步骤链的开头
+            position = 0
+            while position < len(steps) and placed:
+                done = placed.get((task_id, steps[position]["path"]), 0)
+                if done <= 0:
+                    break
+                if done < steps[position]["minutes"]:
+                    head_remaining[task_id] = steps[position]["minutes"] - done
+                    break
+                position += 1
+            if position:
+                positions[task_id] = position
+            covered = position + (1 if task_id in head_remaining else 0)
+            if len(placed_steps.get(task_id, ())) != covered:
+                # 保留的安排不是步骤链的开头（不应出现）：放弃增量，全部重排
+                return self._build(now)
+        if any(task_id not in chains for task_id in placed_steps):
+            return self._build(now)
+        self._chains = cache
+
+        free = expand_windows(self.get_windows(), start, self.horizon_days)
+        slots, unscheduled, gap = pack(chains, free, positions, head_remaining)
+        if first_gap is None or (gap is not None and gap < first_gap):
+            first_gap = gap
+        return {
+            "slots": kept + slots,
+            "unscheduled": unscheduled,
+            "first_gap": first_gap,
+            "generated_at": now,
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    ds = DataService(os.path.join(tempfile.mkdtemp(), "tasks.json"))
+    with ds.batch():
+        for i in range(300):
+            task_id = ds.add_task(f"任务{i}")
+            ds.add_subtasks_batch(task_id, [
+                {"name": f"步骤{j}", "minutes": 5 + (i * 7 + j * 13) % 50} for j in range(8)
+            ])
+    monday = datetime(2025, 6, 2, 8, 0)
+    service = ScheduleService(ds, horizon_days=30)
+
+    t0 = time.perf_counter()
+    plan = service.get_plan(monday)
+    print(f"全量安排 2400 个步骤: {(time.perf_counter() - t0) * 1000:.1f}ms, "
+          f"已安排 {len(plan['slots'])} 段, 未安排 {len(plan['unscheduled'])} 步")
+    for slot in plan["slots"][:5]:
+        print(f"  {slot['start']:%m-%d %H:%M}-{slot['end']:%H:%M} {slot['task_name']} {slot['name']}")
+
+    # 检查：同一任务的步骤按顺序，时间不重叠，每一步安排的时间不超过它的分钟数
+    def check(plan, now=monday):
+        last_end, covered = {}, {}
+        for slot in plan["slots"]:
+            assert slot["start"] >= last_end.get(slot["task_id"], now)
+            last_end[slot["task_id"]] = slot["end"]
+            key = (slot["task_id"], tuple(slot["path"]))
+            covered[key] = covered.get(key, 0) + slot["minutes"]
+        ordered = sorted(plan["slots"], key=lambda s: s["start"])
+        assert all(a["end"] <= b["start"] for a, b in zip(ordered, ordered[1:]))
+        for (task_id, path), minutes in covered.items():
+            node = ds.get_task(task_id)
+            for i in path:
+                node = node["subtasks"][i]
+            assert not node["done"] and minutes <= node["minutes"], (task_id, path, minutes)
+
+    check(plan)
+
+    # 增量重排：完成计划中间的一步，之前的安排不变
+    middle = plan["slots"][len(plan["slots"]) // 2]
+    service._plan = None   # 暂时不让回调用当前时间重排
+    ds.set_subtask_done(middle["task_id"], list(middle["path"]))
+    service._plan = plan
+    t0 = time.perf_counter()
+    with service._lock:
+        service._plan = service._rebuild_after_change({middle["task_id"]}, monday)
+    print(f"增量重排: {(time.perf_counter() - t0) * 1000:.1f}ms")
+    new_plan = service._plan
+    before = [s for s in plan["slots"] if s["start"] < middle["start"]]
+    assert new_plan["slots"][:len(before)] == before
+    assert all(not (s["task_id"] == middle["task_id"] and s["path"] == middle["path"])
+               for s in new_plan["slots"])
+    check(new_plan)
+
+    # 稍后重排：第一个任务的第一步已经开始，完成另一个任务的一步，第一个任务要整体往后排
+    first = new_plan["slots"][0]
+    later = first["start"] + timedelta(minutes=15)
+    other = next(s for s in new_plan["slots"] if s["task_id"] != first["task_id"])
+    service._plan = None
+    ds.set_subtask_done(other["task_id"], list(other["path"]))
+    service._plan = new_plan
+    with service._lock:
+        service._plan = service._rebuild_after_change({other["task_id"]}, later)
+    later_plan = service._plan
+    check(later_plan, later)
+    assert any(s["task_id"] == first["task_id"] and s["path"] == first["path"]
+               for s in later_plan["slots"]), "已开始但没完成的步骤应重新安排"
+    print("检查通过")
@@ -107,6 +107,12 @@ class SettingsService:
             "api_key": "",
             "api_base_url": "",
             "model": "",
+            "speculative_breakdown": False,   # 新任务创建后提前在后台AI分解
+            "recursive_breakdown": False,     # 较长的步骤继续拆分成子步骤
+            "split_minutes": 45,              # 超过多少分钟的步骤需要继续拆分
+            "request_timeout": 60,            # 单次AI请求的超时（秒）
+            "work_windows": [],               # 工作时间段，空表示默认（周一到周五 9-12、14-18）
+            "binary_snapshot": False,         # 同时写入二进制快照，加快下次启动（重启后生效）
             "providers": {
                 "openai": {
                     "name": "OpenAI",
@@ -189,6 +195,11 @@ class SettingsService:
         self.settings["model"] = model
         self.save()  # 保存时会自动加密
     
+    def set_option(self, key: str, value):
+        """修改单个设置项并保存"""
+        self.settings[key] = value
+        self.save()
+    
     def is_api_configured(self) -> bool:
         """检查API是否已配置"""
         return bool(self.settings.get("api_key"))
@@ -0,0 +1,335 @@
+"""
+二进制快照 - tasks.json 旁边的 tasks.json.snap，启动时只读索引，任务在第一次访问时才解码
+
+文件格式（整数都是小端）:
+    b"DINSNAP1"
+    u32 头部长度 + 头部 JSON   {"format", "source", "count", "meta", "columns"}
+                               source: 写入时 tasks.json 的 (mtime_ns, size, inode)，不一致时快照作废
+                               meta:   数据中除 tasks 以外的部分（stats、schema_version 等）
+    列式索引（按 columns 中的长度依次排列）:
+        names   JSON: [[任务ID, ...], [任务名, ...]]
+        offsets u64[count]   记录正文在文件中的位置
+        lengths u32[count]
+        totals  u32[count]   leaf_total（任务列表显示进度用）
+        dones   u32[count]   leaf_done
+        schemas u8[count]    记录版本（判断是否需要迁移）
+    记录: u32 长度 + 紧凑 JSON
+
+JSON 文件仍然是主数据，快照只是加速加载的副本。
+整个文件读入内存而不是 mmap：Windows 上被映射的文件不能被 os.replace 替换。
+"""
+
+import json
+import os
+import struct
+import threading
+from array import array
+from typing import Optional
+
+from services import task_tree
+
+MAGIC = b"DINSNAP1"
+FORMAT_VERSION = 1
+
+_PENDING = object()    # 还没解码的任务
+_MISSING = object()
+
+
+def _typed(typecode: str, raw: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(raw)
+    if values.itemsize and struct.pack("<H", 1) != struct.pack("=H", 1):
+        values.byteswap()   # 大端机器
+    return values
+
+
+def _to_bytes(values: array) -> bytes:
+    if struct.pack("<H", 1) != struct.pack("=H", 1):
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _Records:
+    """快照文件的内容：索引列和按需解码的记录"""
+
+    def __init__(self, buf: bytes, ids: list, names: list, columns: dict):
+        self.buf = buf
+        self.ids = ids
+        self.names = names
+        self.offsets = columns["offsets"]
+        self.lengths = columns["lengths"]
+        self.totals = columns["totals"]
+        self.dones = columns["dones"]
+        self.schemas = columns["schemas"]
+        self.index = {task_id: i for i, task_id in enumerate(ids)}
+        self.decoded = {}               # 任务ID -> 解码出的记录（所有副本共用）
+        self._lock = threading.Lock()
+
+    def raw(self, task_id: str) -> bytes:
+        i = self.index[task_id]
+        return self.buf[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def decode(self, task_id: str) -> dict:
+        with self._lock:
+            task = self.decoded.get(task_id)
+            if task is None:
+                task = json.loads(self.raw(task_id))
+                self.decoded[task_id] = task
+            return task
+
+    def summary(self, task_id: str) -> dict:
+        i = self.index[task_id]
+        return {"name": self.names[i], "leaf_total": self.totals[i], "leaf_done": self.dones[i]}
+
+
+class LazyTasks(dict):
+    """任务字典：值在第一次访问时才从快照解码
+
+    未解码的值在字典里是占位对象，所以所有读取值的方法都要经过 _resolve。
+    重写 __iter__ 是为了让 dict(x) 不走直接复制内部存储的快速路径（会复制出占位对象）。
+    """
+
+    def __init__(self, records: _Records, values=None):
+        super().__init__()
+        if values is None:
+            dict.update(self, dict.fromkeys(records.ids, _PENDING))
+        else:
+            dict.update(self, values)
+        self._records = records
+
+    def _resolve(self, key, value):
+        if value is _PENDING:
+            value = self._records.decode(key)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, _MISSING)
+        if value is _MISSING:
+            return default
+        return self._resolve(key, value)
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        return self._resolve(key, value) if value is _PENDING else value
+
+    def __iter__(self):
+        return iter(dict.keys(self))
+
+    def items(self):
+        return [(key, self._resolve(key, value)) for key, value in list(dict.items(self))]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def copy(self):
+        """浅复制（未解码的任务仍然不解码）"""
+        return LazyTasks(self._records, dict.items(self))
+
+    def peek(self, key):
+        """已解码（或被替换过）的值；还没解码时返回 None"""
+        value = dict.__getitem__(self, key)
+        return None if value is _PENDING else value
+
+    def summaries(self) -> dict:
+        """{任务ID: 解码后的任务 或 索引中的摘要 {"name", "leaf_total", "leaf_done"}}"""
+        records = self._records
+        return {
+            key: records.summary(key) if value is _PENDING else value
+            for key, value in dict.items(self)
+        }
+
+    def outdated_ids(self, schema_version: int) -> list:
+        """记录版本低于 schema_version 的任务（未解码的用索引中的版本判断）"""
+        records = self._records
+        result = []
+        for key, value in dict.items(self):
+            if value is _PENDING:
+                version = records.schemas[records.index[key]]
+            else:
+                version = value.get("schema", 1)
+            if version < schema_version:
+                result.append(key)
+        return result
+
+    def raw_record(self, key) -> Optional[bytes]:
+        """未修改的任务在快照中的原始字节（可以直接写入新快照）"""
+        value = dict.__getitem__(self, key)
+        records = self._records
+        if key not in records.index:
+            return None
+        if value is _PENDING or records.decoded.get(key) is value:
+            return records.raw(key)
+        return None
+
+
+def changed_ids(old_tasks: dict, new_tasks: dict) -> set:
+    """新增、替换或删除的任务ID（只比较对象是否相同，不解码任务）"""
+    decoded = {}
+    for tasks in (old_tasks, new_tasks):
+        if isinstance(tasks, LazyTasks):
+            decoded = tasks._records.decoded
+
+    def resolve(task_id, value):
+        return decoded.get(task_id, value) if value is _PENDING else value
+
+    changed = {
+        task_id for task_id, task in dict.items(new_tasks)
+        if resolve(task_id, dict.get(old_tasks, task_id)) is not resolve(task_id, task)
+    }
+    changed.update(task_id for task_id in dict.keys(old_tasks) if task_id not in new_tasks)
+    return changed
+
+
+def load(path: str, source_signature: tuple) -> Optional[dict]:
+    """读取快照；文件不存在、损坏或与 tasks.json 不一致时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            buf = f.read()
+    except OSError:
+        return None
+    try:
+        if buf[:8] != MAGIC:
+            return None
+        (header_len,) = struct.unpack_from("<I", buf, 8)
+        pos = 12
+        header = json.loads(buf[pos:pos + header_len])
+        pos += header_len
+        if header.get("format") != FORMAT_VERSION or tuple(header["source"]) != tuple(source_signature):
+            return None
+
+        sizes = header["columns"]
+        ids, names = json.loads(buf[pos:pos + sizes["names"]])
+        pos += sizes["names"]
+        columns = {}
+        for name, typecode in (("offsets", "Q"), ("lengths", "I"), ("totals", "I"),
+                               ("dones", "I"), ("schemas", "B")):
+            columns[name] = _typed(typecode, buf[pos:pos + sizes[name]])
+            pos += sizes[name]
+        if not (len(ids) == len(names) == header["count"] == len(columns["offsets"])):
+            return None
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
+
+    data = dict(header["meta"])
+    data["tasks"] = LazyTasks(_Records(buf, ids, names, columns))
+    return data
+
+
+def _summary_of(task: dict) -> tuple:
+    if "leaf_total" in task:
+        return task["leaf_total"], task["leaf_done"]
+    # 旧版本记录没有汇总计数，在副本上计算
+    return task_tree.count_leaves(json.loads(json.dumps(task.get("subtasks", []))))
+
+
+def write(path: str, data: dict, source_signature: tuple, encoded_cache: Optional[dict] = None):
+    """写入快照（先写临时文件再替换）
+
+    encoded_cache: {任务ID: (任务对象, 编码结果)}，对象没变的任务不重新编码；会被更新
+    """
+    tasks = data["tasks"]
+    lazy = isinstance(tasks, LazyTasks)
+    cache = encoded_cache if encoded_cache is not None else {}
+    ids = list(dict.keys(tasks))
+    names, records = [], []
+    totals, dones, schemas = array("I"), array("I"), array("B")
+    new_cache = {}
+
+    for task_id in ids:
+        raw = tasks.raw_record(task_id) if lazy else None
+        if raw is not None:
+            i = tasks._records.index[task_id]
+            names.append(tasks._records.names[i])
+            totals.append(tasks._records.totals[i])
+            dones.append(tasks._records.dones[i])
+            schemas.append(tasks._records.schemas[i])
+            records.append(raw)
+            continue
+        task = tasks[task_id]
+        cached = cache.get(task_id)
+        if cached is not None and cached[0] is task:
+            raw = cached[1]
+        else:
+            raw = json.dumps(task, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        new_cache[task_id] = (task, raw)
+        total, done = _summary_of(task)
+        names.append(task.get("name", ""))
+        totals.append(total)
+        dones.append(done)
+        schemas.append(min(255, task.get("schema", 1)))
+        records.append(raw)
+    if encoded_cache is not None:
+        encoded_cache.clear()
+        encoded_cache.update(new_cache)
+
+    names_block = json.dumps([ids, names], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    meta = {key: value for key, value in data.items() if key != "tasks"}
+    count = len(ids)
+    column_sizes = {"names": len(names_block), "offsets": 8 * count, "lengths": 4 * count,
+                    "totals": 4 * count, "dones": 4 * count, "schemas": count}
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "source": list(source_signature),
+        "count": count,
+        "meta": meta,
+        "columns": column_sizes,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # 记录正文的位置 = 头部 + 索引之后，每条记录前有 4 字节长度
+    pos = 12 + len(header) + sum(column_sizes.values())
+    offsets, lengths = array("Q"), array("I")
+    for raw in records:
+        offsets.append(pos + 4)
+        lengths.append(len(raw))
+        pos += 4 + len(raw)
+
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(names_block)
+        for column in (offsets, lengths, totals, dones, schemas):
+            f.write(_to_bytes(column))
+        for raw in records:
+            f.write(struct.pack("<I", len(raw)))
+            f.write(raw)
+    os.replace(tmp_file, path)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    from benchmarks.datasets import make_data
+
+    data = make_data(2000)
+    data["stats"] = {"daily": {}, "weekly": {}}
+    path = os.path.join(tempfile.mkdtemp(), "tasks.json.snap")
+    signature = (1, 2, 3)
+
+    t0 = time.perf_counter()
+    write(path, data, signature)
+    t1 = time.perf_counter()
+    loaded = load(path, signature)
+    t2 = time.perf_counter()
+    print(f"写入 {(t1 - t0) * 1000:.1f}ms，加载 {(t2 - t1) * 1000:.1f}ms，{os.path.getsize(path)} 字节")
+
+    tasks = loaded["tasks"]
+    first = next(iter(tasks))
+    assert load(path, (1, 2, 4)) is None, "源文件变化后快照应作废"
+    assert list(tasks) == list(data["tasks"])
+    assert tasks.summaries()[first]["name"] == data["tasks"][first]["name"]
+    assert tasks[first] == data["tasks"][first] and len(tasks._records.decoded) == 1
+    copied = tasks.copy()
+    copied[first] = dict(copied[first], name="改名")
+    assert changed_ids(tasks, copied) == {first}
+    write(path, {"tasks": copied, "stats": loaded["stats"]}, signature)
+    assert load(path, signature)["tasks"][first]["name"] == "改名"
+    assert dict(load(path, signature)["tasks"].items()) == dict(copied.items())
+    print("检查通过")
@@ -0,0 +1,168 @@
+"""
+存储注册表 - 网页服务模式下按用户分片、多会话共享 DataService
+
+注意：用户标识只用来区分数据，不是登录验证。能访问服务的人可以用任何 ?user= 打开对应的数据，
+所以网页服务默认只监听本机；需要对外提供时请放在有身份验证的反向代理后面。
+"""
+
+import hashlib
+import os
+import re
+import threading
+from urllib.parse import parse_qs, urlparse
+
+from services.ai_service import AIService
+from services.data_service import DataService
+from services.offline_breakdown import OfflineBreakdownEngine
+from services.outbox_service import OutboxService
+from services.settings_service import SettingsService
+from services.telemetry_service import AITelemetry
+
+
+class StoreRegistry:
+    """按用户（或工作区）分片的 DataService 缓存
+
+    同一个用户的多个会话共享一份内存数据，最后一个会话关闭时释放。
+    DataService 内部的锁保证同一分片的写入串行执行。
+    设置、AI 服务和调用统计也按分片共享，用户之间互不可见。
+    """
+
+    def __init__(self, base_dir: str = "data/users"):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        # shard_id -> {"data": DataService, "sessions": 引用计数, "ai": AIService, "outbox": OutboxService}
+        self._stores = {}
+
+    @staticmethod
+    def user_id_from_route(route: str) -> str:
+        """从页面路由（如 "/?user=xxx"）中取出用户标识"""
+        values = parse_qs(urlparse(route or "").query).get("user")
+        return values[0] if values else "default"
+
+    @staticmethod
+    def normalize_shard_id(user_id: str) -> str:
+        """把用户标识转换成安全的目录名
+
+        只含小写字母、数字、下划线和横线（不超过64个字符）的标识原样使用；
+        其他标识替换字符后加上原文的哈希，用 "." 分隔，不会和原样使用的标识重名。
+        """
+        user_id = (user_id or "").strip() or "default"
+        if re.fullmatch(r"[a-z0-9_\-]{1,64}", user_id):
+            return user_id
+        digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:16]
+        return re.sub(r"[^a-z0-9_\-]", "_", user_id.lower())[:40] + "." + digest
+
+    def shard_path(self, user_id: str) -> str:
+        """分片对应的数据文件路径"""
+        return os.path.join(self.base_dir, self.normalize_shard_id(user_id), "tasks.json")
+
+    def settings_path(self, user_id: str) -> str:
+        """分片自己的设置文件（每个用户使用自己的 API Key）"""
+        return os.path.join(self.base_dir, self.normalize_shard_id(user_id), "settings.json")
+
+    def telemetry_path(self, user_id: str) -> str:
+        """分片自己的AI调用统计"""
+        return os.path.join(self.base_dir, self.normalize_shard_id(user_id), "ai_telemetry.json")
+
+    def acquire(self, user_id: str) -> DataService:
+        """获取分片的 DataService（引用计数 +1）"""
+        shard_id = self.normalize_shard_id(user_id)
+        with self._lock:
+            entry = self._stores.get(shard_id)
+            if entry is None:
+                entry = {"data": DataService(self.shard_path(shard_id)), "sessions": 0,
+                         "ai": None, "outbox": None}
+                self._stores[shard_id] = entry
+            entry["sessions"] += 1
+            return entry["data"]
+
+    def get_ai_service(self, user_id: str) -> AIService:
+        """分片共用的 AIService（自己的设置和调用统计；需要先 acquire）
+
+        同一用户的所有会话用同一个实例，在任何会话中修改设置后立即对其他会话生效。
+        """
+        shard_id = self.normalize_shard_id(user_id)
+        with self._lock:
+            return self._ai_service(self._stores[shard_id], shard_id)
+
+    def _ai_service(self, entry: dict, shard_id: str) -> AIService:
+        if entry["ai"] is None:
+            entry["ai"] = AIService(
+                SettingsService(self.settings_path(shard_id)),
+                OfflineBreakdownEngine(entry["data"]),
+                AITelemetry(self.telemetry_path(shard_id))
+            )
+        return entry["ai"]
+
+    def get_outbox(self, user_id: str) -> OutboxService:
+        """分片共用的离线队列（需要先 acquire；最后一个会话关闭时停止）"""
+        shard_id = self.normalize_shard_id(user_id)
+        with self._lock:
+            entry = self._stores[shard_id]
+            if entry["outbox"] is None:
+                entry["outbox"] = OutboxService(self._ai_service(entry, shard_id), entry["data"])
+                entry["outbox"].start()
+            return entry["outbox"]
+
+    def release(self, user_id: str):
+        """会话结束时调用（引用计数 -1，归零后移出缓存）"""
+        shard_id = self.normalize_shard_id(user_id)
+        with self._lock:
+            entry = self._stores.get(shard_id)
+            if entry is None:
+                return
+            entry["sessions"] -= 1
+            if entry["sessions"] <= 0:
+                del self._stores[shard_id]
+                if entry["outbox"] is not None:
+                    entry["outbox"].stop()
+
+    def get_stats(self) -> dict:
+        """当前缓存状态"""
+        with self._lock:
+            return {
+                "shards": len(self._stores),
+                "sessions": sum(entry["sessions"] for entry in self._stores.values())
+            }
+
+
+# 负载测试：模拟大量并发会话
+if __name__ == "__main__":
+    import random
+    import shutil
+    import tempfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    base_dir = tempfile.mkdtemp()
+    registry = StoreRegistry(base_dir)
+    sessions, users, actions = 300, 20, 10
+
+    def session(n: int) -> float:
+        user_id = f"user{n % users}"
+        ds = registry.acquire(user_id)
+        start = time.perf_counter()
+        try:
+            for i in range(actions):
+                task_id = ds.add_task(f"会话{n}-任务{i}")
+                ds.add_subtask(task_id, "第一步", random.randint(5, 30))
+        finally:
+            registry.release(user_id)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        latencies = sorted(pool.map(session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    expected = sessions // users * actions
+    counts = {
+        DataService(registry.shard_path(f"user{u}")).get_all_tasks().__len__()
+        for u in range(users)
+    }
+    print(f"{sessions} 个会话 / {users} 个用户, 耗时 {elapsed:.2f}s")
+    print(f"会话耗时 p50={latencies[len(latencies) // 2]:.3f}s "
+          f"p99={latencies[int(len(latencies) * 0.99)]:.3f}s")
+    print(f"每个分片任务数: {counts} (期望 {expected})")
+    print(f"结束后缓存: {registry.get_stats()}")
+    shutil.rmtree(base_dir)
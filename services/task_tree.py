@@ -0,0 +1,138 @@
+"""
+任务树 - 子任务可以继续拆分成子步骤（children），进度按叶子节点汇总
+
+有 children 的节点和主任务上保存 leaf_total / leaf_done 两个计数，
+修改时只沿路径向上更新，不需要重新遍历整棵树。
+"""
+
+from datetime import datetime
+from typing import Iterator, Optional
+
+
+def make_node(name: str, minutes: int, children: Optional[list] = None) -> dict:
+    """创建子任务节点（children 为 AI 返回格式的嵌套列表）"""
+    node = {
+        "name": name,
+        "minutes": minutes,
+        "done": False,
+        "created_at": datetime.now().isoformat()
+    }
+    if children:
+        node["children"] = [
+            make_node(c["name"], c["minutes"], c.get("children")) for c in children
+        ]
+        node["leaf_total"] = count_leaves(node["children"])[0]
+        node["leaf_done"] = 0
+    return node
+
+
+def count_leaves(nodes: list) -> tuple:
+    """统计叶子节点 (总数, 已完成数)，同时补全内部节点的计数"""
+    total = done = 0
+    for node in nodes:
+        if node.get("children"):
+            t, d = count_leaves(node["children"])
+            node["leaf_total"], node["leaf_done"] = t, d
+            node["done"] = t > 0 and d == t
+        else:
+            t, d = 1, 1 if node.get("done") else 0
+        total += t
+        done += d
+    return total, done
+
+
+def node_counts(node: dict) -> tuple:
+    """节点贡献的叶子计数 (总数, 已完成数)"""
+    if node.get("children"):
+        return node["leaf_total"], node["leaf_done"]
+    return 1, 1 if node.get("done") else 0
+
+
+def ensure_rollup(task: dict):
+    """旧数据没有汇总计数时补全（只需一次）"""
+    if "leaf_total" not in task:
+        task["leaf_total"], task["leaf_done"] = count_leaves(task["subtasks"])
+
+
+def get_progress(task: dict) -> tuple:
+    """任务进度 (已完成, 总数)"""
+    ensure_rollup(task)
+    return task["leaf_done"], task["leaf_total"]
+
+
+def parse_path(value) -> list:
+    """把外部输入的位置转换成路径：整数、序号列表或 "2.0" 形式的字符串
+
+    格式不对或有负数时抛出 ValueError
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"应为序号或 2.0 形式的路径: {value!r}")
+    if isinstance(value, int):
+        path = [value]
+    elif isinstance(value, str):
+        try:
+            path = [int(part) for part in value.strip().split(".")]
+        except ValueError:
+            raise ValueError(f"应为序号或 2.0 形式的路径: {value!r}") from None
+    elif isinstance(value, list) and value and all(
+            isinstance(i, int) and not isinstance(i, bool) for i in value):
+        path = list(value)
+    else:
+        raise ValueError(f"应为序号或 2.0 形式的路径: {value!r}")
+    if any(i < 0 for i in path):
+        raise ValueError(f"应为序号或 2.0 形式的路径: {value!r}")
+    return path
+
+
+def resolve(task: dict, path) -> tuple:
+    """按路径找到节点，返回 (所在列表, 节点, 祖先节点列表)
+
+    path 可以是整数（顶层序号）或序号列表，如 [2, 0] 表示第3步的第1个子步骤
+    """
+    if isinstance(path, int):
+        path = [path]
+    siblings = task["subtasks"]
+    ancestors = []
+    for i, index in enumerate(path):
+        node = siblings[index]
+        if i == len(path) - 1:
+            return siblings, node, ancestors
+        ancestors.append(node)
+        siblings = node["children"]
+    raise IndexError("空路径")
+
+
+def apply_delta(task: dict, ancestors: list, d_total: int, d_done: int):
+    """把叶子计数的变化加到所有祖先节点和主任务上"""
+    for node in ancestors:
+        node["leaf_total"] += d_total
+        node["leaf_done"] += d_done
+        node["done"] = node["leaf_total"] > 0 and node["leaf_done"] == node["leaf_total"]
+    task["leaf_total"] += d_total
+    task["leaf_done"] += d_done
+
+
+def set_done(node: dict, done: bool, changed: Optional[list] = None) -> int:
+    """设置节点完成状态（内部节点会设置所有叶子），返回已完成叶子数的变化
+
+    changed 不为空时，把状态发生变化的叶子加入其中
+    """
+    if not node.get("children"):
+        delta = (1 if done else 0) - (1 if node.get("done") else 0)
+        node["done"] = done
+        if delta and changed is not None:
+            changed.append(node)
+        return delta
+    delta = sum(set_done(child, done, changed) for child in node["children"])
+    node["leaf_done"] += delta
+    node["done"] = done
+    return delta
+
+
+def iter_nodes(nodes: list, path: tuple = ()) -> Iterator[tuple]:
+    """深度优先遍历，产出 (路径, 节点)"""
+    for i, node in enumerate(nodes):
+        node_path = path + (i,)
+        yield node_path, node
+        if node.get("children"):
+            yield from iter_nodes(node["children"], node_path)
@@ -0,0 +1,194 @@
+"""
+AI调用统计 - 按服务商和模型记录延迟、token用量、重试、错误和费用
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+# 延迟直方图的桶上限（毫秒），最后一个桶是 "更大"
+LATENCY_BUCKETS_MS = [100, 200, 400, 800, 1600, 3200, 6400, 12800, 25600, 51200]
+
+# 参考价格（美元 / 百万token，输入, 输出），按模型名前缀匹配，仅用于估算
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "deepseek-chat": (0.27, 1.1),
+    "glm-4-flash": (0.0, 0.0),
+    "moonshot-v1-8k": (1.7, 1.7),
+}
+
+
+def _new_histogram() -> dict:
+    return {"buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+
+
+def _observe(histogram: dict, value_ms: float):
+    index = len(LATENCY_BUCKETS_MS)
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if value_ms <= bound:
+            index = i
+            break
+    histogram["buckets"][index] += 1
+    histogram["count"] += 1
+    histogram["sum"] += value_ms
+    histogram["max"] = max(histogram["max"], value_ms)
+
+
+def _merge_histogram(target: dict, source: dict):
+    for i, n in enumerate(source["buckets"]):
+        target["buckets"][i] += n
+    target["count"] += source["count"]
+    target["sum"] += source["sum"]
+    target["max"] = max(target["max"], source["max"])
+
+
+def _percentile(histogram: dict, p: float) -> Optional[float]:
+    """近似分位数（返回所在桶的上限）"""
+    if histogram["count"] == 0:
+        return None
+    rank = histogram["count"] * p
+    seen = 0
+    for i, n in enumerate(histogram["buckets"]):
+        seen += n
+        if seen >= rank:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else histogram["max"]
+    return histogram["max"]
+
+
+def _new_entry() -> dict:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "error_types": {},
+        "retries": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "ttfb_ms": _new_histogram(),
+        "latency_ms": _new_histogram(),
+    }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int,
+                  prices: Optional[dict] = None) -> Optional[float]:
+    """估算费用（美元），未知模型返回 None"""
+    prices = prices or MODEL_PRICES
+    for prefix in sorted(prices, key=len, reverse=True):
+        if model.startswith(prefix):
+            price_in, price_out = prices[prefix]
+            return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+    return None
+
+
+class AITelemetry:
+    """按天滚动保存的统计数据：{日期: {"服务商/模型": 统计}}"""
+
+    def __init__(self, telemetry_file: str = "data/ai_telemetry.json", keep_days: int = 30):
+        self.telemetry_file = telemetry_file
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self.days = self._load()
+
+    def _load(self) -> dict:
+        if os.path.exists(self.telemetry_file):
+            try:
+                with open(self.telemetry_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"加载AI调用统计失败: {e}")
+        return {}
+
+    def _save(self):
+        """保存（调用方需持有 self._lock）"""
+        os.makedirs(os.path.dirname(self.telemetry_file) or ".", exist_ok=True)
+        tmp_file = self.telemetry_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.days, f, ensure_ascii=False)
+        os.replace(tmp_file, self.telemetry_file)
+
+    def record(self, provider: str, model: str, latency_ms: float,
+               ttfb_ms: Optional[float] = None, prompt_tokens: int = 0,
+               completion_tokens: int = 0, retries: int = 0, error: Optional[str] = None):
+        """记录一次 chat.completions 调用"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        key = f"{provider}/{model}"
+        with self._lock:
+            entry = self.days.setdefault(today, {}).setdefault(key, _new_entry())
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            _observe(entry["latency_ms"], latency_ms)
+            if ttfb_ms is not None:
+                _observe(entry["ttfb_ms"], ttfb_ms)
+            if error:
+                entry["errors"] += 1
+                entry["error_types"][error] = entry["error_types"].get(error, 0) + 1
+
+            # 删除过期的天
+            cutoff = (datetime.now() - timedelta(days=self.keep_days)).strftime("%Y-%m-%d")
+            for day in [d for d in self.days if d < cutoff]:
+                del self.days[day]
+            self._save()
+
+    def summary(self, days: int = 7, prices: Optional[dict] = None) -> dict:
+        """最近 days 天按 服务商/模型 汇总"""
+        cutoff = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        merged = {}
+        with self._lock:
+            for day, entries in self.days.items():
+                if day < cutoff:
+                    continue
+                for key, entry in entries.items():
+                    total = merged.setdefault(key, _new_entry())
+                    for field in ("calls", "errors", "retries", "prompt_tokens", "completion_tokens"):
+                        total[field] += entry[field]
+                    for error, n in entry["error_types"].items():
+                        total["error_types"][error] = total["error_types"].get(error, 0) + n
+                    _merge_histogram(total["ttfb_ms"], entry["ttfb_ms"])
+                    _merge_histogram(total["latency_ms"], entry["latency_ms"])
+
+        result = {}
+        for key, total in merged.items():
+            model = key.split("/", 1)[1]
+            result[key] = {
+                "calls": total["calls"],
+                "errors": total["errors"],
+                "error_rate": total["errors"] / total["calls"] if total["calls"] else 0.0,
+                "error_types": total["error_types"],
+                "retries": total["retries"],
+                "prompt_tokens": total["prompt_tokens"],
+                "completion_tokens": total["completion_tokens"],
+                "cost_usd": estimate_cost(
+                    model, total["prompt_tokens"], total["completion_tokens"], prices
+                ),
+                "ttfb_ms": {
+                    "p50": _percentile(total["ttfb_ms"], 0.5),
+                    "p95": _percentile(total["ttfb_ms"], 0.95),
+                },
+                "latency_ms": {
+                    "p50": _percentile(total["latency_ms"], 0.5),
+                    "p95": _percentile(total["latency_ms"], 0.95),
+                    "p99": _percentile(total["latency_ms"], 0.99),
+                    "max": total["latency_ms"]["max"],
+                    "histogram": {
+                        "bounds_ms": LATENCY_BUCKETS_MS,
+                        "counts": total["latency_ms"]["buckets"],
+                    },
+                },
+            }
+        return result
+
+    def export_json(self, days: int = 30) -> str:
+        """导出为JSON（供外部看板使用）"""
+        with self._lock:
+            raw = json.loads(json.dumps(self.days))
+        return json.dumps({
+            "app": "TaskBreaker",
+            "exported_at": datetime.now().isoformat(),
+            "summary": self.summary(days),
+            "daily": raw,
+        }, ensure_ascii=False, indent=2)
@@ -0,0 +1,84 @@
+"""
+界面组件 - 任务列表和子任务列表的行（不依赖页面，可以单独构建和测试性能）
+"""
+
+import flet as ft
+
+from services.task_tree import get_progress
+
+# 兼容新旧版本的颜色
+try:
+    colors = ft.Colors
+except AttributeError:
+    colors = ft.colors
+
+
+def task_row(task_id: str, task: dict, is_selected: bool, on_select, on_delete) -> ft.Container:
+    """任务列表的一行，on_select / on_delete 接收任务ID"""
+    done, total = get_progress(task)
+    progress = f"({done}/{total})" if total > 0 else ""
+    is_completed = done == total and total > 0
+
+    return ft.Container(
+        content=ft.Row([
+            ft.Icon(
+                ft.Icons.CHECK_CIRCLE if is_completed
+                else ft.Icons.RADIO_BUTTON_UNCHECKED,
+                color=colors.GREEN if is_completed else colors.GREY,
+                size=20
+            ),
+            ft.Text(
+                f"{task['name']} {progress}",
+                expand=True,
+                weight=ft.FontWeight.BOLD if is_selected else None,
+                size=14
+            ),
+            ft.IconButton(
+                icon=ft.Icons.DELETE_OUTLINE,
+                icon_color=colors.RED_400,
+                icon_size=18,
+                on_click=lambda e: on_delete(task_id)
+            )
+        ]),
+        padding=10,
+        border_radius=8,
+        bgcolor=colors.BLUE_100 if is_selected else colors.GREY_100,
+        on_click=lambda e: on_select(task_id)
+    )
+
+
+def subtask_row(path, subtask: dict, on_toggle, on_delete) -> ft.Container:
+    """子任务列表的一行（按层级缩进），on_toggle / on_delete 接收节点路径"""
+    path = list(path)
+    has_children = bool(subtask.get("children"))
+
+    return ft.Container(
+        content=ft.Row([
+            ft.Checkbox(
+                value=subtask["done"],
+                on_change=lambda e: on_toggle(path)
+            ),
+            ft.Text(
+                subtask["name"],
+                expand=True,
+                size=13,
+                weight=ft.FontWeight.BOLD if has_children else None,
+                style=ft.TextStyle(
+                    decoration=ft.TextDecoration.LINE_THROUGH
+                    if subtask["done"] else None,
+                    color=colors.GREY if subtask["done"] else None
+                )
+            ),
+            ft.Text(f"{subtask['minutes']}min",
+                    size=11, color=colors.GREY_600),
+            ft.IconButton(
+                icon=ft.Icons.CLOSE,
+                icon_size=14,
+                on_click=lambda e: on_delete(path)
+            )
+        ]),
+        padding=6,
+        margin=ft.margin.only(left=20 * (len(path) - 1)),
+        border_radius=6,
+        bgcolor=colors.GREEN_50 if subtask["done"] else colors.WHITE
+    )
@@ -0,0 +1,107 @@
+"""
+计划页面 - 按工作时间排好的步骤（按天分组），可以修改工作时间
+"""
+
+import flet as ft
+
+from services.schedule_service import ScheduleService, format_windows, parse_windows
+from services.settings_service import SettingsService
+
+# 兼容新旧版本
+try:
+    colors = ft.Colors
+    icons = ft.Icons
+except AttributeError:
+    colors = ft.colors
+    icons = ft.icons
+
+WEEKDAYS = "一二三四五六日"
+
+
+def create_plan_view(page: ft.Page, schedule_service: ScheduleService,
+                     settings_service: SettingsService, on_close):
+    """创建计划页面"""
+
+    status_text = ft.Text("", size=12)
+
+    def build_rows(plan: dict) -> list:
+        controls = []
+        current_day = None
+        for slot in plan["slots"]:
+            day = slot["start"].date()
+            if day != current_day:
+                current_day = day
+                controls.append(ft.Container(
+                    ft.Text(f"{day.month}月{day.day}日 周{WEEKDAYS[day.weekday()]}",
+                            weight=ft.FontWeight.BOLD, size=14),
+                    padding=ft.padding.only(top=8)
+                ))
+            controls.append(ft.Row([
+                ft.Text(f"{slot['start']:%H:%M}-{slot['end']:%H:%M}", size=12, width=90,
+                        color=colors.GREY_700),
+                ft.Text(
+                    f"{slot['task_name']} · {slot['name']}"
+                    + ("（部分）" if slot["part"] else ""),
+                    size=13, expand=True
+                ),
+                ft.Text(f"{slot['minutes']:.0f}min", size=11, color=colors.GREY_600),
+            ]))
+        if not plan["slots"]:
+            controls.append(ft.Text("没有需要安排的步骤", size=12, color=colors.GREY))
+        if plan["unscheduled"]:
+            minutes = sum(step["minutes"] for step in plan["unscheduled"])
+            controls.append(ft.Text(
+                f"还有 {len(plan['unscheduled'])} 个步骤（约 {minutes / 60:.1f} 小时）排不进接下来"
+                f" {schedule_service.horizon_days} 天",
+                size=12, color=colors.ORANGE
+            ))
+        return controls
+
+    plan_list = ft.Column(build_rows(schedule_service.get_plan()), spacing=2)
+
+    def refresh(e):
+        plan_list.controls = build_rows(schedule_service.replan())
+        page.update()
+
+    def apply_windows(e):
+        try:
+            windows = parse_windows(windows_input.value or "")
+            if not windows:
+                raise ValueError("至少需要一个时间段")
+        except ValueError as ex:
+            status_text.value = f"❌ 格式有误: {ex}"
+            status_text.color = colors.RED
+            page.update()
+            return
+        settings_service.set_option("work_windows", windows)
+        status_text.value = "✅ 工作时间已保存"
+        status_text.color = colors.GREEN
+        refresh(e)
+
+    windows_input = ft.TextField(
+        label="工作时间",
+        value=format_windows(schedule_service.get_windows()),
+        hint_text="1-5 09:00-12:00 14:00-18:00; 6 10:00-12:00",
+        helper_text="星期 1-7 表示周一到周日，多组用分号分隔",
+        expand=True,
+        on_submit=apply_windows
+    )
+
+    return ft.Container(
+        content=ft.Column([
+            ft.Row([
+                ft.IconButton(icon=icons.ARROW_BACK, on_click=on_close),
+                ft.Text("🗓️ 计划", size=24, weight=ft.FontWeight.BOLD, expand=True),
+                ft.IconButton(icon=icons.REFRESH, tooltip="重新安排", on_click=refresh),
+            ]),
+            ft.Divider(),
+            ft.Row([
+                windows_input,
+                ft.ElevatedButton("应用", on_click=apply_windows),
+            ]),
+            status_text,
+            plan_list,
+        ], scroll=ft.ScrollMode.AUTO, spacing=5),
+        padding=20,
+        expand=True
+    )
@@ -2,9 +2,12 @@
 设置页面 - API配置界面（颜色兼容版）
 """
 
+import os
+from datetime import datetime
 import flet as ft
 from services.settings_service import SettingsService
 from services.ai_service import AIService
+from services.profiler import profiler
 
 # 兼容新旧版本
 try:
@@ -18,9 +21,13 @@ def create_settings_view(
     page: ft.Page, 
     settings_service: SettingsService,
     ai_service: AIService,
-    on_close
+    on_close,
+    server_mode: bool = False
 ):
-    """创建设置页面"""
+    """创建设置页面
+    
+    server_mode: 网页服务模式，不把已保存的 API Key 发给浏览器，也不显示影响整个进程的性能分析
+    """
     
     providers = settings_service.get_providers()
     current_provider = settings_service.settings.get("ai_provider", "deepseek")
@@ -30,10 +37,10 @@ def create_settings_view(
     
     api_key_input = ft.TextField(
         label="API Key",
-        value=current_config["api_key"],
+        value="" if server_mode else current_config["api_key"],
         password=True,
-        can_reveal_password=True,
-        hint_text="请输入你的API密钥",
+        can_reveal_password=not server_mode,
+        hint_text="已配置，留空则保持不变" if server_mode and current_config["api_key"] else "请输入你的API密钥",
         expand=True
     )
     
@@ -70,10 +77,37 @@ def create_settings_view(
         expand=True
     )
     
+    def on_speculative_change(e):
+        settings_service.set_option("speculative_breakdown", speculative_switch.value)
+        status_text.value = "✅ 设置已保存"
+        status_text.color = colors.GREEN
+        page.update()
+    
+    speculative_switch = ft.Switch(
+        label="新任务自动预先分解（点击AI分解时立即出结果，会额外消耗token）",
+        value=settings_service.settings.get("speculative_breakdown", False),
+        on_change=on_speculative_change
+    )
+    
+    def on_recursive_change(e):
+        settings_service.set_option("recursive_breakdown", recursive_switch.value)
+        status_text.value = "✅ 设置已保存"
+        status_text.color = colors.GREEN
+        page.update()
+    
+    recursive_switch = ft.Switch(
+        label=f"递归分解（超过{settings_service.settings.get('split_minutes', 45)}分钟的步骤继续拆分）",
+        value=settings_service.settings.get("recursive_breakdown", False),
+        on_change=on_recursive_change
+    )
+    
     def save_settings(e):
+        api_key = api_key_input.value.strip()
+        if server_mode and not api_key:
+            api_key = settings_service.get_api_config()["api_key"]
         settings_service.set_api_config(
             provider=provider_dropdown.value,
-            api_key=api_key_input.value.strip(),
+            api_key=api_key,
             base_url=base_url_input.value.strip(),
             model=model_input.value.strip()
         )
@@ -101,6 +135,148 @@ def create_settings_view(
         
         page.update()
     
+    # ============ AI调用统计 ============
+    
+    def build_usage_rows() -> list:
+        if ai_service.telemetry is None:
+            return []
+        rows = []
+        for key, stat in sorted(ai_service.telemetry.summary(days=7).items()):
+            cost = stat["cost_usd"]
+            rows.append(ft.Text(key, weight=ft.FontWeight.BOLD, size=12))
+            rows.append(ft.Text(
+                f"调用 {stat['calls']} 次 · 错误率 {stat['error_rate']:.0%} · 重试 {stat['retries']} 次",
+                size=12
+            ))
+            rows.append(ft.Text(
+                f"延迟 p50 {stat['latency_ms']['p50']:.0f}ms / p95 {stat['latency_ms']['p95']:.0f}ms"
+                + (f" · 首字节 p50 {stat['ttfb_ms']['p50']:.0f}ms" if stat["ttfb_ms"]["p50"] else ""),
+                size=12
+            ))
+            rows.append(ft.Text(
+                f"Token 输入 {stat['prompt_tokens']} / 输出 {stat['completion_tokens']}"
+                + (f" · 约 ${cost:.4f}" if cost is not None else ""),
+                size=12, color=colors.GREY_700
+            ))
+        return rows or [ft.Text("暂无调用记录", size=12, color=colors.GREY)]
+    
+    usage_list = ft.Column(build_usage_rows(), spacing=2)
+    
+    def refresh_usage(e):
+        usage_list.controls = build_usage_rows()
+        page.update()
+    
+    def export_usage(e):
+        if ai_service.telemetry is None:
+            return
+        export_text = ai_service.telemetry.export_json()
+        export_path = os.path.join(
+            os.path.dirname(ai_service.telemetry.telemetry_file), "ai_telemetry_export.json"
+        )
+        with open(export_path, "w", encoding="utf-8") as f:
+            f.write(export_text)
+        page.set_clipboard(export_text)
+        status_text.value = f"✅ 统计已导出到 {export_path}（已复制到剪贴板）"
+        status_text.color = colors.GREEN
+        page.update()
+    
+    usage_section = ft.Column([
+        ft.Row([
+            ft.Text("📊 AI调用统计（最近7天）", size=18, weight=ft.FontWeight.BOLD, expand=True),
+            ft.IconButton(icon=icons.REFRESH, tooltip="刷新", on_click=refresh_usage),
+            ft.IconButton(icon=icons.DOWNLOAD, tooltip="导出JSON", on_click=export_usage),
+        ]),
+        usage_list,
+    ], spacing=5)
+    
+    # ============ 性能分析 ============
+    
+    def format_record(record: dict) -> str:
+        parts = " · ".join(
+            f"{name} {ms:.1f}ms"
+            for name, ms in sorted(record["breakdown_ms"].items(), key=lambda x: -x[1])[:4]
+        )
+        return f"{record['at'][11:]}  {record['name']} {record['total_ms']:.1f}ms" + (f"\n    {parts}" if parts else "")
+    
+    def build_perf_rows() -> list:
+        if not profiler.enabled:
+            return [ft.Text("开启后记录每次操作的耗时分解", size=12, color=colors.GREY)]
+        rows = [ft.Text("最慢的操作", weight=ft.FontWeight.BOLD, size=12)]
+        rows += [ft.Text(format_record(r), size=11, selectable=True) for r in profiler.slowest()[:8]]
+        rows.append(ft.Text("最近的操作", weight=ft.FontWeight.BOLD, size=12))
+        rows += [ft.Text(format_record(r), size=11, selectable=True)
+                 for r in reversed(profiler.get_recent(8))]
+        return rows
+    
+    perf_list = ft.Column(build_perf_rows(), spacing=2)
+    
+    def refresh_perf(e):
+        perf_list.controls = build_perf_rows()
+        page.update()
+    
+    def on_profiling_change(e):
+        profiler.enabled = profiling_switch.value
+        if not profiler.enabled and profiler.cprofile_running:
+            profiler.stop_cprofile()
+            cprofile_button.text = "开始 cProfile 采样"
+        refresh_perf(e)
+    
+    def toggle_cprofile(e):
+        if not profiler.cprofile_running:
+            profiler.enabled = profiling_switch.value = True
+            profiler.start_cprofile()
+            cprofile_button.text = "停止并保存采样"
+            status_text.value = "⏺ cProfile 采样中，去操作一下再回来停止"
+            status_text.color = colors.BLUE
+        else:
+            output_file = os.path.join(
+                "data", f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+            )
+            report = profiler.stop_cprofile(output_file)
+            cprofile_button.text = "开始 cProfile 采样"
+            if report:
+                print(report)
+                status_text.value = f"✅ 采样已保存到 {output_file}（前30行已输出到控制台）"
+                status_text.color = colors.GREEN
+            else:
+                status_text.value = "采样期间没有记录到操作"
+                status_text.color = colors.ORANGE
+        refresh_perf(e)
+    
+    def on_snapshot_change(e):
+        settings_service.set_option("binary_snapshot", snapshot_switch.value)
+        status_text.value = "✅ 设置已保存，重启后生效"
+        status_text.color = colors.GREEN
+        page.update()
+    
+    snapshot_switch = ft.Switch(
+        label="二进制快照（任务很多时加快启动，重启后生效）",
+        value=settings_service.settings.get("binary_snapshot", False),
+        on_change=on_snapshot_change
+    )
+    
+    profiling_switch = ft.Switch(
+        label="记录操作耗时（调试用）",
+        value=profiler.enabled,
+        on_change=on_profiling_change
+    )
+    cprofile_button = ft.OutlinedButton(
+        "停止并保存采样" if profiler.cprofile_running else "开始 cProfile 采样",
+        icon=icons.SPEED,
+        on_click=toggle_cprofile
+    )
+    
+    perf_section = ft.Column([
+        ft.Row([
+            ft.Text("⏱️ 性能分析", size=18, weight=ft.FontWeight.BOLD, expand=True),
+            ft.IconButton(icon=icons.REFRESH, tooltip="刷新", on_click=refresh_perf),
+        ]),
+        snapshot_switch,
+        profiling_switch,
+        cprofile_button,
+        perf_list,
+    ], spacing=5, visible=not server_mode)
+    
     help_text = ft.Column([
         ft.Text("📖 如何获取API Key？", weight=ft.FontWeight.BOLD, size=14),
         ft.Text("", size=8),
@@ -167,8 +343,21 @@ def create_settings_view(
             
             status_text,
             
+            ft.Container(height=10),
+            
+            speculative_switch,
+            recursive_switch,
+            
+            ft.Divider(height=30),
+            
+            usage_section,
+            
             ft.Divider(height=30),
             
+            perf_section,
+            
+            ft.Divider(height=30, visible=not server_mode),
+            
             help_text,
             
         ], scroll=ft.ScrollMode.AUTO, spacing=5),
@@ -0,0 +1,124 @@
+"""
+统计页面 - 按天/按周的计划时间、完成时间、完成率和预估准确度
+"""
+
+from datetime import datetime, timedelta
+
+import flet as ft
+
+from services.data_service import DataService
+from services.productivity import period_keys, summarize
+
+# 兼容新旧版本
+try:
+    colors = ft.Colors
+    icons = ft.Icons
+except AttributeError:
+    colors = ft.colors
+    icons = ft.icons
+
+# 范围 -> (汇总类型, 期数, 说明)
+RANGES = {
+    "days": ("daily", 14, "最近14天"),
+    "weeks": ("weekly", 12, "最近12周"),
+    "year": ("weekly", 52, "最近一年（按周）"),
+}
+
+BAR_WIDTH = 180
+
+
+def _recent_keys(scope: str, count: int) -> list:
+    """从早到晚的最近 count 个周期"""
+    today = datetime.now()
+    step = timedelta(days=1 if scope == "daily" else 7)
+    index = 0 if scope == "daily" else 1
+    return [period_keys((today - step * i).isoformat())[index] for i in reversed(range(count))]
+
+
+def _bar(planned: float, done: float, scale: float) -> ft.Stack:
+    return ft.Stack([
+        ft.Container(width=max(2, planned * scale), height=10, bgcolor=colors.GREY_300, border_radius=3),
+        ft.Container(width=max(0, min(done, planned or done) * scale), height=10,
+                     bgcolor=colors.GREEN_400, border_radius=3),
+    ], width=BAR_WIDTH, height=10)
+
+
+def _percent(value) -> str:
+    return "-" if value is None else f"{value:.0%}"
+
+
+def create_stats_view(page: ft.Page, data_service: DataService, on_close):
+    """创建统计页面"""
+
+    def build_rows(range_key: str) -> list:
+        scope, count, _ = RANGES[range_key]
+        rows = summarize(data_service.get_stats(), scope, _recent_keys(scope, count))
+        peak = max([max(r["planned_minutes"], r["done_minutes"]) for r in rows] + [1])
+        scale = BAR_WIDTH / peak
+
+        total = {field: sum(r[field] for r in rows) for field in (
+            "planned_minutes", "done_minutes", "done_steps",
+            "timed_estimate_minutes", "timed_actual_minutes")}
+        completion = total["done_minutes"] / total["planned_minutes"] if total["planned_minutes"] else None
+        accuracy = (total["timed_estimate_minutes"] / total["timed_actual_minutes"]
+                    if total["timed_actual_minutes"] else None)
+
+        controls = [
+            ft.Text(
+                f"计划 {total['planned_minutes']:.0f} 分钟 · 完成 {total['done_minutes']:.0f} 分钟"
+                f"（{total['done_steps']:.0f} 步） · 完成率 {_percent(completion)}",
+                size=13, weight=ft.FontWeight.BOLD
+            ),
+            ft.Text(
+                f"预估准确度 {_percent(accuracy)}（100% 表示估得准，低于 100% 表示实际用时更长）",
+                size=12, color=colors.GREY_700
+            ),
+            ft.Container(height=5),
+        ]
+        for row in reversed(rows):
+            label = row["period"][5:] if scope == "daily" else row["period"]
+            controls.append(ft.Row([
+                ft.Text(label, size=12, width=70),
+                _bar(row["planned_minutes"], row["done_minutes"], scale),
+                ft.Text(
+                    f"{row['done_minutes']:.0f}/{row['planned_minutes']:.0f}分 "
+                    f"{_percent(row['completion_rate'])}"
+                    + (f" · 准确度 {_percent(row['estimate_accuracy'])}"
+                       if row["estimate_accuracy"] is not None else ""),
+                    size=11, color=colors.GREY_700
+                ),
+            ], spacing=8))
+        return controls
+
+    stats_list = ft.Column(build_rows("days"), spacing=4)
+
+    def on_range_change(e):
+        stats_list.controls = build_rows(range_dropdown.value)
+        page.update()
+
+    range_dropdown = ft.Dropdown(
+        value="days",
+        width=200,
+        options=[ft.dropdown.Option(key, label) for key, (_, _, label) in RANGES.items()],
+        on_change=on_range_change
+    )
+
+    return ft.Container(
+        content=ft.Column([
+            ft.Row([
+                ft.IconButton(icon=icons.ARROW_BACK, on_click=on_close),
+                ft.Text("📈 效率统计", size=24, weight=ft.FontWeight.BOLD),
+            ]),
+            ft.Divider(),
+            range_dropdown,
+            ft.Row([
+                ft.Container(width=12, height=10, bgcolor=colors.GREY_300, border_radius=3),
+                ft.Text("计划", size=11),
+                ft.Container(width=12, height=10, bgcolor=colors.GREEN_400, border_radius=3),
+                ft.Text("完成", size=11),
+            ], spacing=4),
+            stats_list,
+        ], scroll=ft.ScrollMode.AUTO, spacing=5),
+        padding=20,
+        expand=True
+    )
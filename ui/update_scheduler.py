@@ -0,0 +1,179 @@
+"""
+界面刷新调度 - 合并多次刷新，每个用户操作（或每帧）只调用一次 page.update()
+
+Flet 在线程池中并发执行同步事件处理函数，所以"正在进行的操作"按线程记录：
+一个慢操作不会拖住其他操作或后台线程的刷新。操作中不要做网络请求等耗时的事。
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+
+import flet as ft
+
+from services.profiler import profiler
+
+try:
+    from flet.core.protocol import CommandEncoder
+except ImportError:  # 旧版本 flet
+    CommandEncoder = None
+
+
+class UpdateScheduler:
+    """标记需要重建的区域，在操作结束或下一帧时统一重建并刷新
+
+    用法:
+        scheduler.register("tasks", rebuild_task_list)
+
+        @scheduler.action("toggle_subtask")
+        def toggle_subtask(index):
+            ...
+            scheduler.invalidate("tasks", "subtasks")
+    """
+
+    def __init__(self, page: ft.Page, frame_interval: float = 1 / 30,
+                 measure_bytes: bool = False, log_actions: bool = False):
+        self.page = page
+        self.frame_interval = frame_interval
+        self.log_actions = log_actions
+        self._rebuilders = {}
+        self._dirty = set()            # 操作以外（后台线程）请求的刷新，合并到下一帧
+        self._needs_update = False
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._timer = None
+
+        # 统计：操作名 -> {"count": 次数, "updates": page.update 次数, "bytes": 发送字节}
+        self.stats = {}
+        if measure_bytes:
+            self._wrap_connection()
+
+    def _stat(self, name: str) -> dict:
+        return self.stats.setdefault(name, {"count": 0, "updates": 0, "bytes": 0})
+
+    def _thread_state(self):
+        """当前线程正在进行的操作：depth 嵌套层数、name 最外层操作名、dirty/needs_update 它请求的刷新"""
+        state = self._local
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.name = None
+            state.dirty = set()
+            state.needs_update = False
+        return state
+
+    def _wrap_connection(self):
+        """统计每次刷新发送给客户端的字节数（按协议的JSON编码估算）"""
+        conn = self.page.connection
+        if conn is None or CommandEncoder is None:
+            return
+        send_commands = conn.send_commands
+
+        def counting_send_commands(session_id, commands):
+            size = len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")))
+            with self._lock:
+                self._stat(self._thread_state().name or "background")["bytes"] += size
+            return send_commands(session_id, commands)
+
+        conn.send_commands = counting_send_commands
+
+    def register(self, region: str, rebuild):
+        """注册区域的重建函数（只修改控件，不调用 page.update）"""
+        self._rebuilders[region] = rebuild
+
+    def invalidate(self, *regions: str):
+        """标记区域需要重建"""
+        state = self._thread_state()
+        if state.depth:
+            # 本线程的操作进行中：等它结束再刷新
+            state.dirty.update(regions)
+            state.needs_update = True
+            return
+        with self._lock:
+            self._dirty.update(regions)
+            self._needs_update = True
+            self._schedule()
+
+    def request_update(self):
+        """控件属性已修改，只需要刷新"""
+        self.invalidate()
+
+    def _schedule(self):
+        # 操作以外的刷新请求（后台线程）合并到下一帧
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(self.frame_interval, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """立即重建脏区域并刷新一次（操作中只处理本操作请求的刷新）"""
+        state = self._thread_state()
+        if state.depth:
+            dirty, needs_update = state.dirty, state.needs_update
+            state.dirty, state.needs_update = set(), False
+        else:
+            with self._lock:
+                dirty, needs_update = self._dirty, self._needs_update
+                self._dirty, self._needs_update = set(), False
+        if not needs_update:
+            return
+        # 重建和发送修改共用的控件树，同一时间只能有一个线程在做
+        with self._lock:
+            with profiler.span("ui.flush"):
+                for region, rebuild in self._rebuilders.items():
+                    if region in dirty:
+                        with profiler.span(f"ui.rebuild.{region}"):
+                            rebuild()
+                self._stat(state.name or "background")["updates"] += 1
+                with profiler.span("ui.page_update"):
+                    self.page.update()
+
+    @contextmanager
+    def action(self, name: str):
+        """一次用户操作：期间的刷新请求合并，结束时只刷新一次（也可以作为装饰器）"""
+        state = self._thread_state()
+        state.depth += 1
+        outer = state.depth == 1
+        if outer:
+            state.name = name
+            with self._lock:
+                stat = self._stat(name)
+                stat["count"] += 1
+                before = (stat["updates"], stat["bytes"])
+        # 最外层操作作为一次性能记录，期间的保存、重建、刷新都计入它的分解
+        span = profiler.span(f"action.{name}") if outer else None
+        if span:
+            span.__enter__()
+        try:
+            yield
+        finally:
+            try:
+                if outer:
+                    self.flush()
+            finally:
+                state.depth -= 1
+                if outer:
+                    state.name = None
+                    state.dirty, state.needs_update = set(), False
+            if outer and self.log_actions:
+                print(f"[ui] {name}: {stat['updates'] - before[0]} 次刷新, "
+                      f"{stat['bytes'] - before[1]} 字节")
+            if span:
+                span.__exit__(None, None, None)
+
+    def get_stats(self) -> dict:
+        """每种操作平均的刷新次数和字节数"""
+        with self._lock:
+            return {
+                name: dict(
+                    stat,
+                    updates_per_action=stat["updates"] / stat["count"] if stat["count"] else 0,
+                    bytes_per_action=stat["bytes"] / stat["count"] if stat["count"] else 0
+                )
+                for name, stat in self.stats.items()
+            }